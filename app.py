@@ -1,14 +1,30 @@
 import os
-from flask import Flask, request, render_template, send_from_directory, redirect, url_for, Response, session, current_app, flash, jsonify
+import logging
+from flask import Flask, request, render_template, send_from_directory, redirect, url_for, Response, session, current_app, flash, jsonify, abort
 from werkzeug.utils import secure_filename
 import uuid
 from pathlib import Path
 import shutil
+import threading
+import multiprocessing
+import queue
+import time
+import zlib
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+try:
+    from flask_compress import Compress
+except ImportError:  # optional: HTML/JSON responses just go out uncompressed
+    Compress = None
 
 # Import the core separation function from your script
 from music_separator import (
-    separate_audio_ultra, get_separation_results, ACTIVE_PROCESSES,
-    get_bpm, time_stretch_audio, fuse_stems # <-- fuse_stems is updated
+    separate_audio_ultra, get_separation_results, separation_complete, get_results_dir, kill_job,
+    get_bpm, cached_bpm, remember_bpm, load_stretched, needs_stretch, fuse_stems, # <-- fuse_stems is updated
+    start_enhancement_pool, MD_PRECOMPILE
 )
 
 UPLOAD_FOLDER = 'uploads'
@@ -16,11 +32,62 @@ OUTPUT_FOLDER = 'output_demucs'
 TEMP_FOLDER = 'temp_fusion'
 ALLOWED_EXTENSIONS = {'mp3', 'wav', 'flac', 'm4a', 'aac'}
 
+# Progress lines are coalesced into one chunk per window instead of one flush per line
+SSE_FLUSH_INTERVAL = 0.1  # seconds
+SSE_FLUSH_BYTES = 16 * 1024
+
+# Uploads are streamed to disk in large chunks rather than Werkzeug's 16KB default
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+MAX_UPLOAD_BYTES = 300 * 1024 * 1024
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
+
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['OUTPUT_FOLDER'] = OUTPUT_FOLDER
 app.config['TEMP_FOLDER'] = TEMP_FOLDER
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
+# Behind a proxy that honours X-Sendfile (Apache mod_xsendfile, lighttpd), let it
+# stream stems from disk itself. Otherwise Werkzeug uses the server's file_wrapper,
+# which is sendfile(2) under gunicorn.
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE') == '1'
 app.secret_key = 'super_secret_key'
+if Compress is not None:
+    # Streams (SSE, /play, /download) pass through untouched; the SSE route gzips itself
+    Compress(app)
+
+# Shared across requests; time-stretching is CPU-bound, so it runs in separate processes
+STRETCH_WORKERS = min(8, os.cpu_count() or 1)
+_STRETCH_POOL = ProcessPoolExecutor(max_workers=STRETCH_WORKERS)
+_STRETCH_POOL_LOCK = threading.Lock()
+
+# Serialises /clear-files so two requests never race on renaming the same folder
+_CLEAR_LOCK = threading.Lock()
+
+# Caps on concurrent heavy jobs: past these, parallel jobs only slow each other down
+FUSE_SEM = threading.BoundedSemaphore(max(1, (os.cpu_count() or 1) // 2))
+PROCESS_SEM = threading.BoundedSemaphore(1)  # one Demucs run at a time per device
+
+# /process-batch runs its files on one shared pool; more than this are turned away
+BATCH_MAX_WORKERS = 8
+_BATCH_POOL = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS)
+BATCH_SEM = threading.BoundedSemaphore(BATCH_MAX_WORKERS)
+
+# Job metadata lives server-side, keyed by a per-request job id (also the id
+# /cancel kills by); the session cookie only carries the job id.
+JOB_META = {}
+_JOB_META_LOCK = threading.Lock()
+JOB_META_TTL = 24 * 60 * 60  # seconds
+# upload name -> (components, model, enhance, threshold) of its last finished separation.
+# Runs of one song share output folders (pass 1 rewrites <model>/<track>/ whatever the
+# component count), so only the most recent settings can be reused.
+SEPARATED_JOBS = {}
+
+# Compile the enhancement kernels while the server starts, not during the first enhanced job.
+# Only in the server process: pool workers re-import this module under spawn (Windows, macOS)
+if MD_PRECOMPILE and multiprocessing.parent_process() is None:
+    start_enhancement_pool()
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
@@ -29,58 +96,395 @@ os.makedirs(TEMP_FOLDER, exist_ok=True)
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def _with_slot(sem, iterable, waiting_line):
+    """
+    Runs 'iterable' while holding 'sem', yielding 'waiting_line' first if
+    the job has to queue behind others. Returns what 'iterable' returns.
+    """
+    if not sem.acquire(blocking=False):
+        yield waiting_line
+        sem.acquire()
+    try:
+        return (yield from iterable)
+    finally:
+        sem.release()
+
+def _run_on_stretch_pool(fn, args_list):
+    """
+    fn(*args) for each args in args_list, run on the stretch pool. A pool broken
+    by a dead worker (e.g. OOM-killed) is replaced and the calls run once more.
+    """
+    global _STRETCH_POOL
+    for attempt in range(2):
+        pool = _STRETCH_POOL
+        try:
+            futures = [pool.submit(fn, *args) for args in args_list]
+            return [future.result() for future in futures]
+        except BrokenProcessPool:
+            if attempt:
+                raise
+            log.warning("A stretch worker died. Restarting the pool and retrying...")
+            with _STRETCH_POOL_LOCK:
+                if _STRETCH_POOL is pool:
+                    _STRETCH_POOL = ProcessPoolExecutor(max_workers=STRETCH_WORKERS)
+            pool.shutdown(wait=False)
+
+@lru_cache(maxsize=256)
+def _cached_results(input_path, output_dir, components, model, mtime_ns):
+    return tuple(get_separation_results(input_path, output_dir, components, model))
+
+def _remember_job(job_id, meta):
+    now = time.monotonic()
+    with _JOB_META_LOCK:
+        # Sweep expired entries so the table can't grow without bound
+        for stale_id in [k for k, v in JOB_META.items() if now - v['created'] > JOB_META_TTL]:
+            del JOB_META[stale_id]
+        JOB_META[job_id] = dict(meta, created=now)
+
+_STREAM_DONE = object()
+_STREAM_QUEUE_SIZE = 256  # items a stream buffers before its producers wait for the client
+_STREAM_PUT_TIMEOUT = 0.5  # seconds between checks for a closed stream while the queue is full
+
+def _iter_in_thread(iterable, idle_timeout=None):
+    """
+    Drains a blocking iterator (e.g. the Demucs progress generator) on a
+    worker thread and hands its items back through a queue, so the
+    response generator only ever waits on the queue.
+    If 'idle_timeout' is set, None is yielded whenever no item arrived in time.
+    """
+    return _iter_merged([iterable], idle_timeout=idle_timeout)
+
+def _iter_merged(iterables, idle_timeout=None, executor=None):
+    """
+    Like _iter_in_thread, but drains several iterators at once (on 'executor'
+    if given) and interleaves their items as they arrive.
+    When this generator is closed (e.g. the client disconnected), the workers
+    stop and close their iterators, which runs their cleanup (killing Demucs).
+    """
+    items = queue.Queue(maxsize=_STREAM_QUEUE_SIZE)
+    stop = threading.Event()
+
+    def _put(item):
+        # Retry on a full queue, so a closed stream is still noticed
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=_STREAM_PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _worker(iterable):
+        try:
+            if stop.is_set():
+                return
+            for item in iterable:
+                if not _put(item):
+                    break
+        except Exception as e:
+            _put(e)
+        finally:
+            # Iterators can only be closed from the thread running them
+            close = getattr(iterable, 'close', None)
+            if close:
+                close()
+            _put(_STREAM_DONE)
+
+    for iterable in iterables:
+        if executor:
+            executor.submit(_worker, iterable)
+        else:
+            threading.Thread(target=_worker, args=(iterable,), daemon=True).start()
+
+    try:
+        remaining = len(iterables)
+        while remaining:
+            try:
+                item = items.get(timeout=idle_timeout)
+            except queue.Empty:
+                yield None
+                continue
+            if item is _STREAM_DONE:
+                remaining -= 1
+                continue
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+def _coalesce_sse(frames):
+    """
+    Buffers SSE frames and yields them as one chunk per SSE_FLUSH_INTERVAL
+    window (or SSE_FLUSH_BYTES), instead of one flush per progress line.
+    A None frame means the producer went quiet, so whatever is buffered is sent.
+    """
+    buf = bytearray()
+    last_flush = time.monotonic()
+    for frame in frames:
+        if frame:
+            buf += frame.encode('utf-8')
+        if buf and (frame is None
+                    or len(buf) > SSE_FLUSH_BYTES
+                    or time.monotonic() - last_flush > SSE_FLUSH_INTERVAL):
+            yield bytes(buf)
+            buf.clear()
+            last_flush = time.monotonic()
+    # Terminal sentinels go out together with anything still buffered
+    if buf:
+        yield bytes(buf)
+
+def _gzip_stream(chunks):
+    """
+    Gzips a stream of byte chunks incrementally. Each chunk is sync-flushed,
+    so the client can decode (and show) it as soon as it arrives.
+    """
+    comp = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        yield comp.compress(chunk) + comp.flush(zlib.Z_SYNC_FLUSH)
+    yield comp.flush()
+
+def _sse_response(frames):
+    # Progress lines are very repetitive, so gzip them when the client allows it
+    body = _coalesce_sse(frames)
+    # Stop nginx-style proxies from buffering the stream until it ends, and
+    # compressing ones from re-encoding it (no-transform)
+    headers = {'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache, no-transform', 'X-Accel-Buffering': 'no'}
+    if 'gzip' in request.accept_encodings:
+        body = _gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(body, mimetype='text/event-stream', headers=headers)
+
+def _check_upload_headers():
+    # Reject on headers alone, before request.files makes Werkzeug read the body
+    if request.content_length is None:
+        abort(411)
+    if request.content_length > current_app.config['MAX_CONTENT_LENGTH']:
+        abort(413)
+    if request.mimetype != 'multipart/form-data':
+        return "Expected a multipart file upload", 400
+    return None
+
+def _save_upload(file):
+    """
+    Streams one uploaded file into UPLOAD_FOLDER, hashing it on the way.
+    Returns (unique_filename, original_filename, input_path).
+    """
+    ext = file.filename.rsplit('.', 1)[1].lower()
+    original_filename = secure_filename(file.filename)
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    partial_path = os.path.join(upload_folder, f"{uuid.uuid4().hex}.{ext}.part")
+    digest = hashlib.sha256()
+    try:
+        with open(partial_path, 'wb', buffering=0) as fh:
+            while True:
+                chunk = file.stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                fh.write(chunk)
+
+        # Content-addressed name: the same song uploaded again maps onto its earlier outputs.
+        # The cleaned original name is only for display.
+        unique_filename = f"{digest.hexdigest()}.{ext}"
+        input_path = os.path.join(upload_folder, unique_filename)
+        os.replace(partial_path, input_path)
+    except BaseException:
+        # Don't leave a half-written upload behind
+        try:
+            os.remove(partial_path)
+        except FileNotFoundError:
+            pass
+        raise
+    return unique_filename, original_filename, input_path
+
+def _separate_or_reuse(input_path, unique_filename, job_id, output_dir, options, progress_callback, waiting_line):
+    """
+    Yields the separation progress for one upload, or a single note when the
+    same audio was last separated with the same options and its stems are
+    still on disk.
+    """
+    settings = (options["components"], options["model"],
+                options["enhance"], options["silence_threshold_db"])
+    with _JOB_META_LOCK:
+        already_done = SEPARATED_JOBS.get(unique_filename) == settings
+    if already_done and separation_complete(input_path, output_dir, options["components"], options["model"]):
+        yield progress_callback("This audio was already separated with these settings. Reusing its stems.")
+        return
+
+    def separate():
+        # Demucs is about to rewrite this song's stems, so whatever was recorded no longer holds
+        with _JOB_META_LOCK:
+            SEPARATED_JOBS.pop(unique_filename, None)
+        return (yield from separate_audio_ultra(
+            input_path,
+            output_dir=output_dir,
+            job_id=job_id,
+            progress_callback=progress_callback,
+            **options
+        ))
+
+    succeeded = yield from _with_slot(PROCESS_SEM, separate(), waiting_line)
+
+    # Only a clean run is remembered: a failed, cancelled or partial one may leave stale stems behind
+    if succeeded and separation_complete(input_path, output_dir, options["components"], options["model"]):
+        with _JOB_META_LOCK:
+            SEPARATED_JOBS[unique_filename] = settings
+
+def _separation_options(form):
+    return {
+        "components": int(form.get('components')),
+        "model": form.get('model'),
+        "enhance": form.get('enhance') == 'on',
+        "silence_threshold_db": int(form.get('silence_threshold_db', 30)),
+    }
+
 @app.route('/', methods=['GET'])
 def index():
     return render_template('index.html')
 
 @app.route('/process', methods=['POST'])
 def process():
-    # ... (This function is unchanged and correct) ...
+    rejected = _check_upload_headers()
+    if rejected:
+        return rejected
+
     if 'file' not in request.files:
         return "No file part", 400
     file = request.files['file']
     if file.filename == '' or not allowed_file(file.filename):
         return "Invalid file", 400
 
-    original_filename = secure_filename(file.filename)
-    unique_filename = f"{uuid.uuid4()}_{original_filename}"
-    input_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
-    file.save(input_path)
-
-    components = int(request.form.get('components'))
-    model = request.form.get('model')
-    enhance = request.form.get('enhance') == 'on'
-    silence_threshold_db = int(request.form.get('silence_threshold_db', 30))
-    
-    session['last_file'] = {
+    unique_filename, original_filename, input_path = _save_upload(file)
+
+    options = _separation_options(request.form)
+
+    # Uploads of the same song share a name, so cancelling goes by a per-request id
+    job_id = uuid.uuid4().hex
+    _remember_job(job_id, {
         "filename": unique_filename,
-        "components": components,
-        "model": model,
-        "silence_threshold_db": silence_threshold_db
-    }
+        "original_filename": original_filename,
+        "components": options["components"],
+        "model": options["model"],
+        "silence_threshold_db": options["silence_threshold_db"]
+    })
+    session['job_id'] = job_id
 
     output_dir_for_later = current_app.config['OUTPUT_FOLDER']
 
     def generate_progress(output_dir):
         try:
-            for progress_line in separate_audio_ultra(
+            # Demucs runs on its own thread; this generator just relays lines
+            yield from _iter_in_thread(_separate_or_reuse(
                 input_path,
-                output_dir=output_dir,
-                model=model,
-                components=components,
-                enhance=enhance,
-                silence_threshold_db=silence_threshold_db,
-                progress_callback=lambda line: f"data: {line}\n\n"
-            ):
-                if progress_line:
-                    yield progress_line
+                unique_filename,
+                job_id,
+                output_dir,
+                options,
+                progress_callback=lambda line: f"data: {line}\n\n",
+                waiting_line="data: Waiting for another separation to finish...\n\n"
+            ), idle_timeout=SSE_FLUSH_INTERVAL)
             
             yield f"data: SEPARATION_COMPLETE::{unique_filename}::{original_filename}\n\n"
             
         except Exception as e:
             yield f"data: ERROR::{str(e)}\n\n"
 
-    return Response(generate_progress(output_dir_for_later), mimetype='text/event-stream')
+    return _sse_response(generate_progress(output_dir_for_later))
+
+@app.route('/process-batch', methods=['POST'])
+def process_batch():
+    """
+    Separates several uploads in one request. Progress for every file is
+    multiplexed onto a single SSE stream as "FILE::<unique_filename>::<line>".
+    /cancel stops the whole batch.
+    """
+    rejected = _check_upload_headers()
+    if rejected:
+        return rejected
+
+    files = [f for f in request.files.getlist('files') if f.filename and allowed_file(f.filename)]
+    if not files:
+        return "No valid files", 400
+
+    # Take one batch slot per file up front; if the pool is saturated, give them back
+    taken = 0
+    while taken < len(files) and BATCH_SEM.acquire(blocking=False):
+        taken += 1
+    if taken < len(files):
+        for _ in range(taken):
+            BATCH_SEM.release()
+        return jsonify({"error": "Too many files in progress. Please try again shortly."}), 429
+
+    # Jobs whose slot is still held for them: a job claims its slot when it starts
+    # and gives it back when it ends; slots of jobs that never start are given
+    # back when the response closes
+    unstarted = set()
+    unstarted_lock = threading.Lock()
+
+    def claim_slot(job_id):
+        with unstarted_lock:
+            if job_id not in unstarted:
+                return False
+            unstarted.discard(job_id)
+            return True
+
+    def release_unstarted_slots():
+        with unstarted_lock:
+            for _ in unstarted:
+                BATCH_SEM.release()
+            unstarted.clear()
+
+    def file_progress(input_path, unique_filename, original_filename, job_id):
+        if not claim_slot(job_id):
+            return  # the response closed before this job started
+        try:
+            yield from _separate_or_reuse(
+                input_path,
+                unique_filename,
+                job_id,
+                output_dir,
+                options,
+                progress_callback=lambda line: f"data: FILE::{unique_filename}::{line}\n\n",
+                waiting_line=f"data: FILE::{unique_filename}::Waiting for another separation to finish...\n\n"
+            )
+            yield f"data: SEPARATION_COMPLETE::{unique_filename}::{original_filename}\n\n"
+        except Exception as e:
+            yield f"data: FILE::{unique_filename}::ERROR::{str(e)}\n\n"
+        finally:
+            BATCH_SEM.release()
+
+    # Each file's job id is "<batch id>:<n>", so kill_job(batch_id) takes down every one of them
+    batch_id = uuid.uuid4().hex
+    jobs = []
+    try:
+        options = _separation_options(request.form)
+        output_dir = current_app.config['OUTPUT_FOLDER']
+        for n, file in enumerate(files):
+            unique_filename, original_filename, input_path = _save_upload(file)
+            job_id = f"{batch_id}:{n}"
+            _remember_job(job_id, {
+                "filename": unique_filename,
+                "original_filename": original_filename,
+                "components": options["components"],
+                "model": options["model"],
+                "silence_threshold_db": options["silence_threshold_db"]
+            })
+            jobs.append(file_progress(input_path, unique_filename, original_filename, job_id))
+            unstarted.add(job_id)
+    except BaseException:
+        # Bad form fields or a failed save: no job will run, so give every slot back
+        for _ in files:
+            BATCH_SEM.release()
+        raise
+
+    _remember_job(batch_id, {"batch_job_ids": sorted(unstarted)})
+    session['job_id'] = batch_id
+
+    resp = _sse_response(_iter_merged(jobs, idle_timeout=SSE_FLUSH_INTERVAL, executor=_BATCH_POOL))
+    # Runs even if the body is never iterated (client gone before reading it)
+    resp.call_on_close(release_unstarted_slots)
+    return resp
 
 @app.route('/results-for-file', methods=['POST'])
 def results_for_file():
@@ -91,14 +495,20 @@ def results_for_file():
     unique_filename = data.get('unique_filename')
     original_filename = data.get('original_filename')
     
-    input_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    output_dir = current_app.config['OUTPUT_FOLDER']
+    input_path = os.path.join(upload_folder, unique_filename)
     
-    results = get_separation_results(
-        input_path,
-        current_app.config['OUTPUT_FOLDER'],
-        int(data.get('components')),
-        data.get('model')
-    )
+    components = int(data.get('components'))
+    model = data.get('model')
+    
+    # Served from memory until the stem folder changes (its mtime is part of the key)
+    results_dir = get_results_dir(input_path, output_dir, components, model)
+    try:
+        mtime_ns = os.stat(results_dir).st_mtime_ns if results_dir else None
+    except FileNotFoundError:
+        mtime_ns = None
+    results = list(_cached_results(input_path, output_dir, components, model, mtime_ns))
     
     # We pass the unique_filename to the partial template for the data attributes
     rendered_html = render_template(
@@ -116,6 +526,15 @@ def results_for_file():
 # -----------------------------------------------------------------
 @app.route('/fuse', methods=['POST'])
 def fuse_tracks():
+    # Reject rather than queue: a waiting HTTP request has no progress stream
+    if not FUSE_SEM.acquire(blocking=False):
+        return jsonify({"error": "Too many fusions in progress. Please try again shortly."}), 429
+    try:
+        return _fuse_tracks()
+    finally:
+        FUSE_SEM.release()
+
+def _fuse_tracks():
     # --- *** HEAVILY MODIFIED *** ---
     # This route now parses the complex payload with volume/mute data
     
@@ -125,20 +544,26 @@ def fuse_tracks():
     model_map = data.get('model_map')
     components_map = data.get('components_map')
 
+    # Resolve the folders once; current_app.config goes through a context-local proxy
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    output_folder = current_app.config['OUTPUT_FOLDER']
+
     # 1. Determine the Master BPM
-    master_song_input_path = os.path.join(current_app.config['UPLOAD_FOLDER'], master_tempo_song_id)
+    master_song_input_path = os.path.join(upload_folder, master_tempo_song_id)
     if not os.path.exists(master_song_input_path):
         return jsonify({"error": "Master tempo song not found"}), 404
         
+    # Cached by (path, size, mtime) in music_separator, so an overwritten file is re-analysed
     master_bpm = get_bpm(master_song_input_path)
     if master_bpm == 0:
         return jsonify({"error": "Could not detect master BPM"}), 400
 
-    print(f"--- STARTING FUSION ---")
-    print(f"Master Tempo: {master_bpm} BPM (from {master_tempo_song_id})")
+    log.info("--- STARTING FUSION ---")
+    log.info("Master Tempo: %s BPM (from %s)", master_bpm, master_tempo_song_id)
 
     stems_to_fuse = [] # This will hold dicts: {"path": "...", "volume": 1.0}
-    temp_dir = current_app.config['TEMP_FOLDER']
+    stems_by_song = {} # song_id -> {stem name: stem info}, so each song's output is scanned once
+    stretch_jobs = [] # stems_to_fuse entries for stems that need stretching
     
     # 2. Iterate, Stretch, and Collect Stems
     for stem_name, stem_data in fusion_map.items():
@@ -150,42 +575,70 @@ def fuse_tracks():
 
         # Skip if user selected "None" or Muted the track
         if not song_id or is_muted:
-            print(f"Skipping stem: {stem_name} (Muted or None)")
+            log.debug("Skipping stem: %s (Muted or None)", stem_name)
             continue
             
-        print(f"Processing stem: {stem_name} from song: {song_id} at volume {volume}")
+        log.debug("Processing stem: %s from song: %s at volume %s", stem_name, song_id, volume)
         
         # Find the original (non-stretched) stem file
         model = model_map.get(song_id)
         components = components_map.get(song_id)
         
-        input_path = os.path.join(current_app.config['UPLOAD_FOLDER'], song_id)
-        all_stems = get_separation_results(input_path, current_app.config['OUTPUT_FOLDER'], components, model)
+        song_stems = stems_by_song.get(song_id)
+        if song_stems is None:
+            input_path = os.path.join(upload_folder, song_id)
+            all_stems = get_separation_results(input_path, output_folder, components, model)
+            song_stems = {s['name'].lower(): s for s in all_stems}
+            stems_by_song[song_id] = song_stems
         
         original_stem_path = None
-        for s in all_stems:
-            if s['name'].lower() == stem_name:
-                original_stem_path = os.path.join(current_app.config['OUTPUT_FOLDER'], s['path'])
-                break
+        stem_info = song_stems.get(stem_name)
+        if stem_info:
+            original_stem_path = os.path.join(output_folder, stem_info['path'])
         
-        if not original_stem_path or not os.path.exists(original_stem_path):
-            print(f"  Could not find original stem for {stem_name} from {song_id}")
+        # get_separation_results only lists stems it found on disk, so no second stat here;
+        # a stem that vanishes afterwards is dropped below or left out by fuse_stems
+        if not original_stem_path:
+            log.warning("  Could not find original stem for %s from %s", stem_name, song_id)
             continue
 
-        # 3. Time-Stretch if necessary
-        stretched_stem_path = os.path.join(temp_dir, f"{song_id}_{stem_name}.wav")
-        
-        if song_id == master_tempo_song_id:
-            print("  At master tempo. Copying.")
-            shutil.copy(original_stem_path, stretched_stem_path)
-        else:
-            time_stretch_audio(original_stem_path, stretched_stem_path, master_bpm)
-        
         # Add a dict with path AND volume to the list
-        stems_to_fuse.append({
-            "path": stretched_stem_path,
+        stem_entry = {
+            "path": original_stem_path,
             "volume": volume
-        })
+        }
+        stems_to_fuse.append(stem_entry)
+
+        # 3. Time-Stretch if necessary
+        if song_id != master_tempo_song_id:
+            # Stretched later, in parallel with the other stems
+            stretch_jobs.append(stem_entry)
+        else:
+            # Already at master tempo, so mix straight from the separated stem
+            log.debug("  At master tempo. Using original stem.")
+
+    # 3b. Stretch every non-master stem at once on the shared process pool; the
+    # stretched samples come back in memory, so no temp WAV is written or re-read.
+    # A stem whose BPM is known to match already stays a path for fuse_stems to stream
+    stretch_calls, stretch_targets = [], []
+    for stem_entry in stretch_jobs:
+        source_bpm = cached_bpm(stem_entry["path"])
+        if source_bpm and not needs_stretch(source_bpm, master_bpm):
+            continue
+        stretch_calls.append((stem_entry["path"], master_bpm, source_bpm))
+        stretch_targets.append(stem_entry)
+    results = _run_on_stretch_pool(load_stretched, stretch_calls)
+    for stem_entry, stretched in zip(stretch_targets, results):
+        if stretched is None:
+            log.warning("  Could not stretch %s, leaving it out of the mix", stem_entry['path'])
+            stems_to_fuse.remove(stem_entry)
+            continue
+        samples, sr, source_bpm = stretched
+        if source_bpm is not None:
+            # The workers' caches only help when a stem lands on the same worker again
+            remember_bpm(stem_entry["path"], source_bpm)
+        if samples is not None:
+            stem_entry["samples"], stem_entry["sr"] = samples, sr
 
     if not stems_to_fuse:
         return jsonify({"error": "No stems were selected for fusion"}), 400
@@ -193,18 +646,14 @@ def fuse_tracks():
     # 4. Fuse the stretched stems (fuse_stems is now volume-aware)
     fused_filename = f"fused_{uuid.uuid4()}.mp3"
     fused_output_path_relative = os.path.join("fused_tracks", fused_filename)
-    fused_output_path_full = os.path.join(current_app.config['OUTPUT_FOLDER'], fused_output_path_relative)
+    fused_output_path_full = os.path.join(output_folder, fused_output_path_relative)
     
     os.makedirs(os.path.dirname(fused_output_path_full), exist_ok=True)
     
     if not fuse_stems(stems_to_fuse, fused_output_path_full):
         return jsonify({"error": "Failed to fuse stems"}), 500
 
-    # 5. Clean up temporary stretched files
-    for stem_info in stems_to_fuse:
-        os.remove(stem_info["path"])
-
-    print(f"--- FUSION COMPLETE ---")
+    log.info("--- FUSION COMPLETE ---")
     
     return jsonify({
         "success": True, 
@@ -222,7 +671,11 @@ def download_file(filepath):
 
 @app.route('/play/<path:filepath>')
 def play_file(filepath):
-    return send_from_directory(current_app.config['OUTPUT_FOLDER'], filepath)
+    # send_file already answers Range and If-None-Match requests; this only makes the
+    # player revalidate, since a stem URL is rewritten by re-separation, enhancement and /clear-files
+    resp = send_from_directory(current_app.config['OUTPUT_FOLDER'], filepath, max_age=0)
+    resp.cache_control.no_cache = True
+    return resp
 
 @app.route('/clear-files', methods=['POST'])
 def clear_files():
@@ -232,43 +685,60 @@ def clear_files():
     
     folders_to_clear = [upload_folder, output_folder, temp_folder]
     
-    for folder in folders_to_clear:
-        if not os.path.exists(folder):
-            continue
-        for item in os.listdir(folder):
-            item_path = os.path.join(folder, item)
+    with _CLEAR_LOCK:
+        for folder in folders_to_clear:
+            # Swap in an empty folder straight away and delete the old tree in the background
+            trash = f"{folder}.trash.{uuid.uuid4()}"
             try:
-                if os.path.isfile(item_path) or os.path.islink(item_path):
-                    os.unlink(item_path)
-                elif os.path.isdir(item_path):
-                    shutil.rmtree(item_path)
-            except Exception as e:
-                print(f"Failed to delete {item_path}. Reason: {e}")
-                flash(f"Error deleting some files: {e}", "error")
+                os.rename(folder, trash)
+            except FileNotFoundError:
+                continue  # nothing to clear; re-created below
+            except OSError as e:
+                # e.g. a stem is still open on Windows; fall back to deleting in place
+                print(f"Could not move {folder} aside ({e}). Deleting in place.")
+                # scandir entries carry their file type, so no extra stat per item
+                with os.scandir(folder) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_file(follow_symlinks=False) or entry.is_symlink():
+                                os.unlink(entry.path)
+                            elif entry.is_dir(follow_symlinks=False):
+                                shutil.rmtree(entry.path)
+                        except OSError as e:
+                            print(f"Failed to delete {entry.path}. Reason: {e}")
+                            flash(f"Error deleting some files: {e}", "error")
+                continue
+
+            os.makedirs(folder, exist_ok=True)
+            threading.Thread(target=shutil.rmtree, args=(trash,), kwargs={'ignore_errors': True}, daemon=True).start()
     
     # Re-create dirs
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
-    os.makedirs(TEMP_FOLDER, exist_ok=True)
+    for folder in folders_to_clear:
+        os.makedirs(folder, exist_ok=True)
 
-    session.pop('last_file', None)
+    with _JOB_META_LOCK:
+        JOB_META.clear()
+        SEPARATED_JOBS.clear()
+    session.pop('job_id', None)
     flash("All temporary files and outputs have been cleared.", "success")
     return redirect(url_for('index'))
 
 @app.route('/cancel', methods=['POST'])
 def cancel_process():
-    last_file_info = session.get('last_file')
-    if not last_file_info:
+    job_id = session.get('job_id')
+    with _JOB_META_LOCK:
+        job_info = JOB_META.get(job_id)
+    if not job_info:
         return {"status": "error", "message": "No active job found in session."}, 404
 
-    job_id = last_file_info['filename']
-    process_to_kill = ACTIVE_PROCESSES.get(job_id)
-
-    if process_to_kill and process_to_kill.poll() is None:
-        process_to_kill.kill()
+    # Also takes down any pass-2 runs still going in parallel
+    if kill_job(job_id):
         return {"status": "success", "message": f"Process {job_id} cancelled."}, 200
     
     return {"status": "error", "message": "Process not found or already finished."}, 404
 
 if __name__ == '__main__':
+    # Development server. For real use, run a single threaded gunicorn worker
+    # (job state and /cancel live in this process's memory):
+    #   gunicorn -w 1 -k gthread --threads 32 -t 3600 app:app
     app.run(debug=True, threaded=True)
\ No newline at end of file
@@ -0,0 +1,22 @@
+"""
+Runs several two-stem Demucs separations in one process, so the model is
+loaded once instead of once per `python -m demucs` call.
+
+Used by music_separator._run_demucs_batch for the 8-component pass 2:
+    python demucs_batch.py MODEL DEVICE '[[input_file, output_dir, two_stems_target], ...]'
+"""
+import sys
+import json
+
+import music_separator
+
+
+def main():
+    model, device, jobs = sys.argv[1], sys.argv[2], json.loads(sys.argv[3])
+    for input_file, output_dir, two_stems_target in jobs:
+        for line in music_separator._run_demucs_in_process(input_file, output_dir, model, device, two_stems_target, progress_callback=lambda line: line):
+            print(line, flush=True)
+
+
+if __name__ == "__main__":
+    main()
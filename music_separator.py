@@ -1,15 +1,39 @@
 ﻿import sys
 import os
+import re
+import time
+import codecs
+import contextlib
 import subprocess
-import glob
 import argparse
+import functools
+import hashlib
+import json
+import importlib.util
 from pathlib import Path
+import queue
+from collections import deque
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from types import MappingProxyType
 from typing import Callable, Optional
-import librosa
 import soundfile as sf
 import shutil
+import tempfile
 import numpy as np
-from pydub import AudioSegment # pydub is key for volume
+try:
+    import numba
+except ImportError:  # optional: enhancement falls back to NumPy (+ numexpr if present)
+    numba = None
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+try:
+    import fcntl  # reflinks, Linux only
+except ImportError:
+    fcntl = None
 
 # A global dictionary to keep track of active subprocesses by a unique job ID
 ACTIVE_PROCESSES = {}
@@ -18,53 +42,152 @@ ACTIVE_PROCESSES = {}
 #  UPDATED FUSION FUNCTIONS
 # -----------------------------------------------------------------
 
-def get_bpm(audio_file) -> float:
-    # ... (This function is unchanged) ...
+def _load_mono(path):
+    """float32 mono samples at the file's own rate, as librosa.load(path, sr=None) returns them."""
+    try:
+        y, sr = sf.read(path, dtype='float32', always_2d=True)
+    except RuntimeError:  # a format libsndfile can't decode; librosa falls back to audioread
+        import librosa
+        return librosa.load(path, sr=None)
+    return y.mean(axis=1, dtype=np.float32), sr
+
+# (abspath, size, mtime_ns) -> detected BPM, oldest first, so a file isn't re-analysed.
+# Failed detections (get_bpm's default) are never stored, so they are retried.
+# app.py feeds back the BPMs its stretch workers detect, via remember_bpm
+_BPM_CACHE = {}
+_BPM_CACHE_LOCK = threading.Lock()
+_BPM_CACHE_MAX = 256
+_DEFAULT_BPM = 120.0
+
+_BPM_SR = 11025  # rate BPM detection analyses at
+
+def _bpm_from_array(y, sr) -> float:
+    import librosa  # only BPM detection and time-stretching need it
+    # Tempo needs the onset strength envelope (onset_detect gives frame indices),
+    # and only the tempo estimate, not a full beat track
+    hop_length, n_fft, n_mels = 1024, 2048, 128
+    if sr > _BPM_SR:
+        # Tempo lives in the low kHz: analyse a low-rate copy, with the hop and
+        # window scaled so the onset envelope keeps its time resolution
+        hop_length = max(1, round(hop_length * _BPM_SR / sr))
+        n_fft = max(1, round(n_fft * _BPM_SR / sr))
+        n_mels = 64  # a short window has too few bins for 128 mel bands
+        y = librosa.resample(y, orig_sr=sr, target_sr=_BPM_SR, res_type="soxr_qq")
+        sr = _BPM_SR
+    onset_env = librosa.onset.onset_strength(y=y, sr=sr, hop_length=hop_length, n_fft=n_fft, n_mels=n_mels)
+    tempo = getattr(librosa.feature, "tempo", None) or librosa.beat.tempo  # moved in librosa 0.10
+    bpm = tempo(onset_envelope=onset_env, sr=sr, hop_length=hop_length)[0]
+    return float(bpm)
+
+def _bpm_key(audio_file):
+    st = os.stat(audio_file)
+    return (os.path.abspath(audio_file), st.st_size, st.st_mtime_ns)
+
+def _store_bpm(key, bpm):
+    with _BPM_CACHE_LOCK:
+        _BPM_CACHE[key] = bpm
+        while len(_BPM_CACHE) > _BPM_CACHE_MAX:
+            del _BPM_CACHE[next(iter(_BPM_CACHE))]
+
+def cached_bpm(audio_file) -> Optional[float]:
+    """audio_file's BPM if it was detected (or remembered) before, without decoding it; else None."""
     try:
+        key = _bpm_key(audio_file)
+    except OSError:
+        return None
+    with _BPM_CACHE_LOCK:
+        return _BPM_CACHE.get(key)
+
+def remember_bpm(audio_file, bpm: float):
+    """Caches a BPM detected elsewhere (e.g. in a worker process) for audio_file as it is now."""
+    try:
+        _store_bpm(_bpm_key(audio_file), bpm)
+    except OSError:
+        pass
+
+def _detect_bpm(audio_file, y=None, sr=None) -> Optional[float]:
+    """BPM of audio_file, or None if it can't be detected."""
+    try:
+        key = _bpm_key(audio_file)
+        with _BPM_CACHE_LOCK:
+            bpm = _BPM_CACHE.get(key)
+        if bpm is not None:
+            return bpm
         print(f"   Analysing BPM for {audio_file}...")
-        y, sr = librosa.load(audio_file, sr=None)
-        onset_env = librosa.onset.onset_detect(y=y, sr=sr, hop_length=1024)
-        bpm = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr)["bpm"]
+        if y is None:
+            y, sr = _load_mono(audio_file)
+        bpm = _bpm_from_array(y, sr)
         print(f"   Detected BPM: {bpm}")
-        return float(bpm)
     except Exception as e:
-        print(f"   Could not detect BPM: {e}. Defaulting to 120.")
-        return 120.0
+        print(f"   Could not detect BPM: {e}.")
+        return None
+    _store_bpm(key, bpm)
+    return bpm
 
-def time_stretch_audio(input_file, output_file, target_bpm: float):
-    # ... (This function is unchanged) ...
-    try:
-        print(f"   Stretching {Path(input_file).name} to {target_bpm} BPM...")
-        y, sr = librosa.load(input_file, sr=None)
-        source_bpm = get_bpm(input_file)
-        
-        if source_bpm == 0:
-            print("   Source BPM is 0, cannot stretch.")
-            return False
+def get_bpm(audio_file, y=None, sr=None) -> float:
+    """BPM of audio_file, 120 if it can't be detected; pass y/sr if the samples are already loaded."""
+    bpm = _detect_bpm(audio_file, y, sr)
+    if bpm is None:
+        print(f"   Defaulting to {_DEFAULT_BPM:g}.")
+        return _DEFAULT_BPM
+    return bpm
 
-        stretch_rate = target_bpm / source_bpm
+def time_stretch_array(y, sr, target_bpm: float, source_bpm: Optional[float] = None) -> np.ndarray:
+    """y stretched from source_bpm (detected if not given) to target_bpm, in memory."""
+    import librosa
+    if source_bpm is None:
+        source_bpm = _bpm_from_array(y, sr)
+    if source_bpm == 0:
+        raise ValueError("source BPM is 0, cannot stretch")
+    if not needs_stretch(source_bpm, target_bpm):
+        return y
+    return librosa.effects.time_stretch(y, rate=target_bpm / source_bpm)
 
-        if np.abs(stretch_rate - 1.0) < 0.01:
-            print("   File is already at target BPM. Copying.")
-            shutil.copy(input_file, output_file)
-            return True
+def needs_stretch(source_bpm: float, target_bpm: float) -> bool:
+    """False when source_bpm is within 1% of target_bpm, close enough to mix as it is."""
+    return np.abs(target_bpm / source_bpm - 1.0) >= 0.01
 
-        y_stretched = librosa.effects.time_stretch(y, rate=stretch_rate)
-        
-        sf.write(output_file, y_stretched, sr)
-        print(f"   Successfully stretched and saved to {output_file}")
-        return True
+def load_stretched(input_file, target_bpm: float, source_bpm: Optional[float] = None):
+    """
+    (samples, sr, source_bpm) of input_file stretched to target_bpm, for fuse_stems
+    to mix from memory instead of a stretched WAV on disk. samples is None when the
+    file is already at target_bpm, so the caller can stream it from disk instead.
+    source_bpm is detected if not given; the one returned is None if detection
+    failed (the stretch then assumed 120 BPM). None on failure.
+    """
+    try:
+        y = None
+        detected_bpm = source_bpm
+        if source_bpm is None:
+            y, sr = _load_mono(input_file)
+            detected_bpm = _detect_bpm(input_file, y, sr)  # reuse the samples loaded above
+            source_bpm = _DEFAULT_BPM if detected_bpm is None else detected_bpm
+        if source_bpm == 0:
+            raise ValueError("source BPM is 0, cannot stretch")
+        if not needs_stretch(source_bpm, target_bpm):
+            print(f"   {Path(input_file).name} is already at {target_bpm} BPM.")
+            return None, None, detected_bpm
+        print(f"   Stretching {Path(input_file).name} to {target_bpm} BPM...")
+        if y is None:
+            y, sr = _load_mono(input_file)
+        y_stretched = time_stretch_array(y, sr, target_bpm, source_bpm)
+        # Clip as the stretched PCM_16 WAV did, so the phase vocoder's overshoot mixes the same
+        return np.clip(y_stretched, -1.0, 1.0, out=y_stretched), sr, detected_bpm
     except Exception as e:
         print(f"   Error during time-stretch: {e}")
-        return False
+        return None
+
+_FUSE_CHUNK = 48000  # frames mixed per block, ~1 s at 48 kHz
 
 def fuse_stems(stems_to_fuse: list, output_file: str):
     """
     Mixes a list of audio file paths into a single output file.
     All stems must be .wav files.
     'stems_to_fuse' is a list of dicts: [{"path": "...", "volume": 1.0}, ...]
+    A dict may also carry "samples" and "sr" (e.g. from load_stretched); those
+    are mixed from memory and "path" only names the stem.
+    A stem file that can't be opened (e.g. removed since it was listed) is left out.
     """
-    # --- *** HEAVILY MODIFIED *** ---
     try:
         print(f"   Fusing {len(stems_to_fuse)} stems with volume...")
         
@@ -72,39 +195,92 @@ def fuse_stems(stems_to_fuse: list, output_file: str):
             print("   No stems to fuse.")
             return False
 
-        # Load the first stem as the base
-        first_stem_data = stems_to_fuse[0]
-        base = AudioSegment.from_wav(first_stem_data["path"])
-        
-        # Apply volume to the base
-        # Convert linear volume (e.g., 1.0) to dB
-        # A volume of 0 is -infinity dB, so we set a floor
-        if first_stem_data["volume"] == 0:
-            volume_db = -120  # Effective silence
-        else:
-            volume_db = 20 * np.log10(first_stem_data["volume"])
-        
-        print(f"   Applying {volume_db:.2f} dB to {Path(first_stem_data['path']).name}")
-        base = base + volume_db
+        # Mix in float32 with NumPy, one block at a time, so memory stays at a
+        # block per stem however long the track or however many stems there are
+        with contextlib.ExitStack() as stack:
+            sources, rates, in_memory, volumes = [], [], {}, []
+            for stem_data in stems_to_fuse:
+                if "samples" in stem_data:
+                    samples = stem_data["samples"]
+                    in_memory[len(sources)] = samples.reshape(len(samples), -1)  # mono 1-D -> (frames, 1)
+                    sources.append(None)
+                    rates.append(stem_data["sr"])
+                else:
+                    try:
+                        src = stack.enter_context(sf.SoundFile(stem_data["path"]))
+                    except (RuntimeError, OSError) as e:  # LibsndfileError is a RuntimeError
+                        print(f"   Skipping {Path(stem_data['path']).name}: {e}")
+                        continue
+                    sources.append(src)
+                    rates.append(src.samplerate)
+                # Report the gain in dB as before; a volume of 0 is effective silence
+                volume = float(stem_data["volume"])
+                volume_db = -120 if volume == 0 else 20 * np.log10(volume)
+                print(f"   Applying {volume_db:.2f} dB to {Path(stem_data['path']).name}")
+                volumes.append(np.float32(volume))
 
-        # Overlay the rest of the stems
-        for stem_data in stems_to_fuse[1:]:
-            stem_to_overlay = AudioSegment.from_wav(stem_data["path"])
-            
-            # Apply volume to this stem
-            if stem_data["volume"] == 0:
-                volume_db = -120
-            else:
-                volume_db = 20 * np.log10(stem_data["volume"])
-            
-            print(f"   Applying {volume_db:.2f} dB to {Path(stem_data['path']).name}")
-            stem_to_overlay = stem_to_overlay + volume_db
-            
-            # We assume all stems are the same length after stretching
-            base = base.overlay(stem_to_overlay)
-        
-        # Export the final mixed file
-        base.export(output_file, format="mp3", bitrate="320k") # Export as high-quality MP3
+            if not sources:
+                print("   None of the stems could be opened.")
+                return False
+
+            # The first stem is the base: it sets the length and rate. Like pydub's
+            # overlay, anything past its end is dropped, and mono stems (e.g.
+            # time-stretched ones) go to both channels
+            mix_sr = rates[0]
+            frames = len(in_memory[0]) if 0 in in_memory else sources[0].frames
+            channels = max(
+                in_memory[i].shape[1] if i in in_memory else src.channels
+                for i, src in enumerate(sources)
+            )
+
+            # A stem at another rate can't be resampled block by block without
+            # seams, so it is resampled whole; stretched stems are the only case
+            for i, (src, sr) in enumerate(zip(sources, rates)):
+                if sr != mix_sr:
+                    import librosa
+                    samples = in_memory[i] if i in in_memory else src.read(dtype='float32', always_2d=True)
+                    in_memory[i] = librosa.resample(samples.T, orig_sr=sr, target_sr=mix_sr).T
+
+            # Export the final mixed file as high-quality MP3: raw PCM straight into
+            # ffmpeg's stdin, rather than pydub's temp WAV round-trip. stderr goes to
+            # a temp file so a chatty ffmpeg can't block on it while we write
+            from pydub import AudioSegment  # only for its ffmpeg/avconv lookup
+            command = [
+                AudioSegment.converter, "-y",
+                "-f", "s16le", "-ar", str(mix_sr), "-ac", str(channels), "-i", "pipe:0",
+                "-f", "mp3", "-b:a", "320k", output_file,
+            ]
+            stderr = stack.enter_context(tempfile.TemporaryFile())
+            process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=stderr)
+
+            mix = np.empty((_FUSE_CHUNK, channels), dtype=np.float32)
+            try:
+                for start in range(0, frames, _FUSE_CHUNK):
+                    n = min(_FUSE_CHUNK, frames - start)
+                    acc = mix[:n]
+                    acc.fill(0)
+                    for i, (src, volume) in enumerate(zip(sources, volumes)):
+                        if i in in_memory:
+                            block = in_memory[i][start:start + n]
+                        else:
+                            block = src.read(n, dtype='float32', always_2d=True)
+                        if block.shape[1] != channels:
+                            block = block[:, :1]
+                        acc[:len(block)] += block * volume
+                    np.clip(acc, -1.0, 1.0, out=acc)
+                    process.stdin.write(np.rint(acc * 32767).astype(np.int16).tobytes())
+            except BrokenPipeError:
+                pass  # ffmpeg exited early; its return code and stderr say why
+            finally:
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+                returncode = process.wait()
+
+            if returncode != 0:
+                stderr.seek(0)
+                raise RuntimeError(f"ffmpeg failed: {stderr.read().decode(errors='replace')[-500:]}")
         print(f"   Fusion complete! Saved to {output_file}")
         return True
     except Exception as e:
@@ -115,35 +291,250 @@ def fuse_stems(stems_to_fuse: list, output_file: str):
 #  EXISTING SEPARATION & ENHANCEMENT FUNCTIONS (Unchanged)
 # -----------------------------------------------------------------
 
-def enhance_audio(input_file, output_file, enhancement_type="vocals", silence_threshold_db: int = 30):
-    # ... (This function is unchanged) ...
+# -----------------------------------------------------------------
+#  FUSED ENHANCEMENT KERNELS
+# -----------------------------------------------------------------
+# normalize -> gain -> tanh -> preemphasis -> clip in one pass over the
+# samples, instead of one temporary array per step. One kernel serves every
+# stem type, configured from _ENHANCE_PARAMS. The elementwise part is
+# parallel; preemphasis is a 1-sample recurrence so it runs as a serial fix-up.
+
+if numba is not None:
+    _njit, _prange = numba.njit, numba.prange
+else:
+    # The kernels below stay plain Python and _enhance_kernel is swapped for _enhance_kernel_numpy
+    def _njit(*args, **kwargs):
+        return lambda func: func
+    _prange = range
+
+@_njit(cache=True)
+def _preemphasis_clip(out, coef, prev, first_block):
+    # prev is the last unfiltered sample of the previous block (ignored for the first).
+    # Returns this block's last unfiltered sample for the next call.
+    n = out.shape[0]
+    if n == 0:
+        return prev
+    t0 = out[0]
+    t1 = out[1] if n > 1 else t0
+    last = out[n - 1]
+    # Backwards, so out[i - 1] still holds the unfiltered sample
+    for i in range(n - 1, 0, -1):
+        out[i] = min(max(out[i] - coef * out[i - 1], -1.0), 1.0)
+    if first_block:
+        # Same edge handling as librosa.effects.preemphasis (linear extrapolation)
+        out[0] = min(max(t0 + (2.0 * t0 - t1), -1.0), 1.0)
+    else:
+        out[0] = min(max(t0 - coef * prev, -1.0), 1.0)
+    return last
+
+@_njit(parallel=True, fastmath=True, cache=True)
+def _enhance_kernel(y, scale, tanh_out, preemph_coef, prev, first_block, out):
+    # scale folds the 1/peak normalisation into the branch gain.
+    # tanh_out == 0 means no saturation stage, preemph_coef == 0 no preemphasis.
+    # prev/return carry the preemphasis state from one block to the next.
+    if tanh_out > 0.0:
+        for i in _prange(y.shape[0]):
+            out[i] = np.tanh(y[i] * scale) * tanh_out
+    else:
+        for i in _prange(y.shape[0]):
+            out[i] = y[i] * scale
+    if preemph_coef > 0.0:
+        return _preemphasis_clip(out, preemph_coef, prev, first_block)
+    # Without preemphasis the output is tanh * k with k <= 1, already inside [-1, 1]
+    return prev
+
+def _enhance_kernel_numpy(y, scale, tanh_out, preemph_coef, prev, first_block, out):
+    # Same contract as _enhance_kernel, a few whole-block passes instead of one
+    if tanh_out > 0.0:
+        if numexpr is not None:
+            # One multithreaded pass, no temporaries
+            numexpr.evaluate("tanh(y * scale) * tanh_out", out=out, casting="same_kind")
+        else:
+            np.multiply(y, scale, out=out)
+            np.tanh(out, out=out)
+            out *= tanh_out
+    else:
+        np.multiply(y, scale, out=out)
+    if preemph_coef <= 0.0 or out.shape[0] == 0:
+        return prev
+    t0 = out[0]
+    t1 = out[1] if out.shape[0] > 1 else t0
+    last = out[-1]
+    out[1:] -= preemph_coef * out[:-1]  # the right side is a copy, so this reads unfiltered samples
+    out[0] = t0 + (2.0 * t0 - t1) if first_block else t0 - preemph_coef * prev
+    np.clip(out, -1.0, 1.0, out=out)
+    return last
+
+if numba is None:
+    _enhance_kernel = _enhance_kernel_numpy
+
+# enhancement_type -> (gain, tanh output scale, preemphasis coefficient)
+_ENHANCE_PARAMS = {
+    "vocals": (1.2, 0.8, 0.97),
+    "drums": (1.3 * 1.1, 0.9, 0.0),
+    "bass": (1.4 * 1.2, 0.8, 0.0),
+    "other": (1.1, 0.0, 0.95),  # other instruments
+}
+
+# The only signature enhance_audio calls the kernel with
+_KERNEL_SIGNATURE = "(float32[::1], float32, float32, float32, float32, boolean, float32[::1])"
+
+MD_PRECOMPILE = os.environ.get("MD_PRECOMPILE", "1") == "1"
+
+def _precompile_kernels():
+    # Compile, or load from the on-disk cache
+    if numba is not None:
+        _enhance_kernel.compile(_KERNEL_SIGNATURE)
+
+# Enhancement runs in these worker processes, never in the importing one:
+# once numba's parallel thread pool is up, forking new workers can deadlock.
+_ENHANCE_POOL = None
+_ENHANCE_POOL_LOCK = threading.Lock()
+
+def _enhance_pool():
+    global _ENHANCE_POOL
+    with _ENHANCE_POOL_LOCK:
+        if _ENHANCE_POOL is None:
+            _ENHANCE_POOL = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+            if MD_PRECOMPILE:
+                # JIT the kernels in a worker straight away, so the first stem doesn't stall
+                _ENHANCE_POOL.submit(_precompile_kernels)
+        return _ENHANCE_POOL
+
+def start_enhancement_pool():
+    """Starts the enhancement workers ahead of the first job, so (with MD_PRECOMPILE) the kernels are compiled by then."""
+    _enhance_pool()
+
+def _discard_enhance_pool(pool):
+    """Drops a pool broken by a dead worker (e.g. OOM-killed); the next _enhance_pool() starts a fresh one."""
+    global _ENHANCE_POOL
+    with _ENHANCE_POOL_LOCK:
+        if _ENHANCE_POOL is pool:
+            _ENHANCE_POOL = None
+    pool.shutdown(wait=False)
+
+def _submit_enhance(tasks):
+    """Starts _enhance_one on each task; hand the result to _enhance_results."""
+    pool = _enhance_pool()
     try:
-        y, sr = librosa.load(input_file, sr=None)
-        y_trimmed, index = librosa.effects.trim(y, top_db=silence_threshold_db)
+        return pool, [pool.submit(_enhance_one, task) for task in tasks]
+    except BrokenProcessPool:
+        return pool, None  # _enhance_results replaces the pool
+
+def _enhance_results(tasks, submitted=None):
+    """
+    _enhance_one's result for each task, from 'submitted' (see _submit_enhance)
+    if they are already running. If the pool broke, it is replaced and the
+    tasks are run once more.
+    """
+    pool, futures = submitted or _submit_enhance(tasks)
+    try:
+        if futures is not None:
+            return [future.result() for future in futures]
+    except BrokenProcessPool:
+        pass
+    print(" An enhancement worker died. Restarting the pool and retrying...")
+    _discard_enhance_pool(pool)
+    return list(_enhance_pool().map(_enhance_one, tasks))
+
+# Stems are streamed in blocks of this many frames (a multiple of the trim hop)
+# so a worker never holds a whole decoded stem in memory
+_ENHANCE_BLOCK_FRAMES = 1 << 16
+_TRIM_HOP = 512
+
+_BLOCK_BUFFERS = threading.local()
+
+def _block_buffers(channels):
+    """This thread's read, downmix and output buffers, reused by every block of every stem it enhances."""
+    buffers = getattr(_BLOCK_BUFFERS, "by_channels", None)
+    if buffers is None:
+        buffers = _BLOCK_BUFFERS.by_channels = {}
+    if channels not in buffers:
+        buffers[channels] = (
+            np.empty((_ENHANCE_BLOCK_FRAMES, channels), dtype=np.float32),
+            np.empty(_ENHANCE_BLOCK_FRAMES, dtype=np.float32),
+            np.empty(_ENHANCE_BLOCK_FRAMES, dtype=np.float32),
+        )
+    return buffers[channels]
+
+def _mono_block(block, out=None):
+    # Mono, as the enhancement always worked on; out (if given) receives a stereo downmix
+    if block.shape[1] == 1:
+        return np.ascontiguousarray(block[:, 0])
+    if out is not None:
+        return np.mean(block, axis=1, dtype=np.float32, out=out[:block.shape[0]])
+    return block.mean(axis=1, dtype=np.float32)
 
-        if y_trimmed.size == 0:
+def _scan_stem(input_file, hop_length=_TRIM_HOP):
+    """First pass over a stem: per hop-sized block, its energy and its peak (mono)."""
+    energies, peaks = [], []
+    for block in sf.blocks(input_file, blocksize=_ENHANCE_BLOCK_FRAMES, dtype='float32', always_2d=True):
+        y = _mono_block(block)
+        padded = np.zeros(-(-y.shape[0] // hop_length) * hop_length, dtype=np.float32)
+        padded[:y.shape[0]] = y
+        chunks = padded.reshape(-1, hop_length)
+        energies.append(np.einsum('ij,ij->i', chunks, chunks))
+        peaks.append(np.maximum(chunks.max(axis=1), -chunks.min(axis=1)))
+    if not energies:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+    return np.concatenate(energies), np.concatenate(peaks)
+
+def _non_silent_bounds(block_energy, n, top_db, frame_length=2048, hop_length=_TRIM_HOP):
+    """Same span librosa.effects.trim keeps (centred RMS frames, dB below the loudest), from block energies."""
+    n_frames = 1 + n // hop_length
+    blocks_per_frame = frame_length // hop_length
+    # A centred frame spans blocks_per_frame blocks; pad with the zero blocks trim's padding adds
+    padded = np.zeros(n_frames - 1 + blocks_per_frame, dtype=np.float32)
+    padded[blocks_per_frame // 2:blocks_per_frame // 2 + block_energy.shape[0]] = block_energy
+    frame_energy = np.lib.stride_tricks.sliding_window_view(padded, blocks_per_frame).sum(axis=1)
+    mean_square = np.maximum(frame_energy / frame_length, 1e-10)  # amin**2, as amplitude_to_db clamps
+
+    non_silent = np.flatnonzero(mean_square > mean_square.max() * 10.0 ** (-top_db / 10.0))
+    if non_silent.size == 0:
+        return 0, 0
+    return int(non_silent[0]) * hop_length, min(n, (int(non_silent[-1]) + 1) * hop_length)
+
+def enhance_audio(input_file, output_file, enhancement_type="vocals", silence_threshold_db: int = 30):
+    try:
+        # Demucs stems are plain WAVs at their final rate, so read them straight
+        # through libsndfile, in blocks: one pass to find the trim span and peak,
+        # one to enhance that span into the output
+        n = sf.info(input_file).frames
+        block_energy, block_peak = _scan_stem(input_file)
+        # Digitally silent stems (common in 6/8-component mode) have nothing to
+        # trim or enhance: keep the original without framing or a second pass
+        if not block_peak.size or block_peak.max() <= np.finfo(np.float32).tiny:
+            print(f"   Skipping silent file: {Path(input_file).name}")
+            return False
+        start, end = _non_silent_bounds(block_energy, n, silence_threshold_db)
+        if end <= start:
             print(f"   Skipping empty file: {Path(input_file).name}")
             return False
-        
-        if enhancement_type == "vocals":
-            y_normalized = librosa.util.normalize(y_trimmed)
-            y_enhanced = np.tanh(y_normalized * 1.2) * 0.8
-            y_enhanced = librosa.effects.preemphasis(y_enhanced, coef=0.97)
-        elif enhancement_type == "drums":
-            y_normalized = librosa.util.normalize(y_trimmed)
-            y_enhanced = y_normalized * 1.3
-            y_enhanced = np.tanh(y_enhanced * 1.1) * 0.9
-        elif enhancement_type == "bass":
-            y_normalized = librosa.util.normalize(y_trimmed)
-            y_enhanced = y_normalized * 1.4
-            y_enhanced = np.tanh(y_enhanced * 1.2) * 0.8
-        else:  # other instruments
-            y_normalized = librosa.util.normalize(y_trimmed)
-            y_enhanced = y_normalized * 1.1
-            y_enhanced = librosa.effects.preemphasis(y_enhanced, coef=0.95)
-        
-        y_enhanced = np.clip(y_enhanced, -1.0, 1.0)
-        sf.write(output_file, y_enhanced, sr)
+
+        # start is block-aligned and end only cuts into the last block, so this is the trimmed span's exact peak
+        peak = float(block_peak[start // _TRIM_HOP:-(-end // _TRIM_HOP)].max())
+        if not np.isfinite(peak):
+            raise ValueError("Audio buffer is not finite everywhere")
+        silent = peak <= np.finfo(np.float32).tiny  # silence stays silence on every branch
+
+        gain, tanh_out, preemph_coef = _ENHANCE_PARAMS.get(enhancement_type, _ENHANCE_PARAMS["other"])
+        scale, tanh_out, preemph_coef = np.float32(gain / peak if not silent else 1.0), np.float32(tanh_out), np.float32(preemph_coef)
+        prev = np.float32(0.0)
+
+        with sf.SoundFile(input_file) as src, \
+             sf.SoundFile(output_file, 'w', samplerate=src.samplerate, channels=1, subtype='PCM_16') as dst:
+            # Same 16-bit PCM Demucs writes
+            src.seek(start)
+            read_buffer, mono_buffer, out_buffer = _block_buffers(src.channels)
+            blocks = src.blocks(frames=end - start, dtype='float32', always_2d=True, out=read_buffer)
+            for i, block in enumerate(blocks):
+                y = _mono_block(block, mono_buffer)
+                if silent:
+                    dst.write(y)
+                    continue
+                out = out_buffer[:y.shape[0]]
+                prev = _enhance_kernel(y, scale, tanh_out, preemph_coef, prev, i == 0, out)
+                dst.write(out)
         return True
     except Exception as e:
         print(f" Audio enhancement error: {e}")
@@ -157,51 +548,384 @@ def enhance_audio(input_file, output_file, enhancement_type="vocals", silence_th
 # ...  _print_component_info, print_ultra_components_info, main
 # ...  are all unchanged and correct.) ...
 
+# Stem name -> enhancement type (a key of _ENHANCE_PARAMS); built once, read-only
+_ENHANCEMENT_MAP = MappingProxyType({
+    "vocals": "vocals", "drums": "drums", "bass": "bass", "other": "other",
+    "piano": "other", "guitar": "other", "lead_vocals": "vocals",
+    "harmony": "vocals", "kick_snare": "drums", "cymbals": "drums"
+})
+
+def _track_name(input_file):
+    # Demucs names the track folder after the file name minus its extension
+    return os.path.splitext(os.path.basename(input_file))[0]
+
 def _get_enhancement_map():
-    return {
-        "vocals": "vocals", "drums": "drums", "bass": "bass", "other": "other",
-        "piano": "other", "guitar": "other", "lead_vocals": "vocals",
-        "harmony": "vocals", "kick_snare": "drums", "cymbals": "drums"
-    }
+    return _ENHANCEMENT_MAP
+
+# Opt-in: run Demucs through its Python API inside this process instead of
+# spawning `python -m demucs` per pass. Skips an interpreter + torch start-up
+# per pass; /cancel on an in-process run takes effect once the model call
+# already under way has finished.
+DEMUCS_IN_PROCESS = os.environ.get("DEMUCS_IN_PROCESS") == "1"
+
+# Opt-in reduced precision for in-process runs: "fp16" (CUDA) or "bf16" (CUDA or CPU).
+# Applied through autocast rather than .half(), so the STFT stays in float32.
+DEMUCS_PRECISION = os.environ.get("DEMUCS_PRECISION", "fp32")
+
+def _autocast(device):
+    import torch
+
+    dtype = {"fp16": torch.float16, "bf16": torch.bfloat16}.get(DEMUCS_PRECISION)
+    device_type = "cuda" if str(device).startswith("cuda") else "cpu"
+    if dtype is None or (dtype is torch.float16 and device_type != "cuda"):
+        return contextlib.nullcontext()
+    return torch.autocast(device_type=device_type, dtype=dtype)
+
+# Loaded models, keyed by (name, device), so only the first in-process run pays for the weights
+_MODEL_CACHE = {}
+_MODEL_CACHE_LOCK = threading.Lock()
+
+def _get_cached_model(name, device):
+    from demucs.pretrained import get_model
+
+    key = (name, device)
+    with _MODEL_CACHE_LOCK:
+        model = _MODEL_CACHE.get(key)
+        if model is None:
+            model = get_model(name)
+            model.to(device)
+            model.eval()
+            _MODEL_CACHE[key] = model
+        return model
+
+@functools.lru_cache(maxsize=1)
+def _demucs_importable():
+    """In-process and batched runs need demucs in this interpreter; otherwise fall back to the plain CLI."""
+    if importlib.util.find_spec("demucs") is None:
+        print(" demucs isn't importable in this interpreter; running each pass as `python -m demucs` instead.")
+        return False
+    return True
+
+class _InProcessRun:
+    """Stands in for a Popen in ACTIVE_PROCESSES so kill_job can cancel an in-process separation."""
+    def __init__(self):
+        self.cancelled = threading.Event()
+
+    def poll(self):
+        return 0 if self.cancelled.is_set() else None
+
+    def kill(self):
+        self.cancelled.set()
+
+# In-process pass-1 stems kept in memory for the pass-2 run that separates them
+# again, keyed by the path they were saved to: (tensor, samplerate).
+# Saves pass 2 an ffmpeg decode of a WAV we have only just written.
+_STEM_HANDOFF = {}
+_STEM_HANDOFF_LOCK = threading.Lock()
+
+def _take_handed_off_stem(path, samplerate):
+    with _STEM_HANDOFF_LOCK:
+        entry = _STEM_HANDOFF.pop(os.path.abspath(path), None)
+    if entry is None or entry[1] != samplerate:
+        return None
+    return entry[0]
+
+def _discard_handed_off_stems(track_dir):
+    """Drops stems pass 2 never picked up (cancelled or failed jobs)."""
+    track_dir = os.path.abspath(track_dir)
+    with _STEM_HANDOFF_LOCK:
+        for path in [p for p in _STEM_HANDOFF if os.path.dirname(p) == track_dir]:
+            del _STEM_HANDOFF[path]
+
+# torch's intra-op thread count is process-wide, so parallel in-process runs share one cap
+_TORCH_THREADS_LOCK = threading.Lock()
+_TORCH_THREADS = {"users": 0, "default": None}
+
+@contextlib.contextmanager
+def _torch_threads(threads):
+    """Caps torch at 'threads' intra-op threads while any capped in-process run is going."""
+    import torch
+
+    with _TORCH_THREADS_LOCK:
+        if _TORCH_THREADS["users"] == 0:
+            _TORCH_THREADS["default"] = torch.get_num_threads()
+        _TORCH_THREADS["users"] += 1
+        torch.set_num_threads(threads)
+    try:
+        yield
+    finally:
+        with _TORCH_THREADS_LOCK:
+            _TORCH_THREADS["users"] -= 1
+            if _TORCH_THREADS["users"] == 0:
+                torch.set_num_threads(_TORCH_THREADS["default"])
+
+def _run_demucs_in_process(input_file, output_dir, model, device, two_stems_target=None, job_id: Optional[str] = None, progress_callback: Optional[Callable[[str], None]] = None, keep_stems=(), threads: Optional[int] = None, jobs: Optional[int] = None):
+    """Separates in memory and writes the stems in the CLI's layout: <output_dir>/<model>/<track>/<stem>.wav.
+    threads/jobs split the CPU between parallel runs, like OMP_NUM_THREADS/--jobs for the CLI."""
+    import torch
+    from demucs.apply import apply_model
+    from demucs.audio import AudioFile, prevent_clip, save_audio
+
+    print(f" Running Demucs in-process on '{Path(input_file).name}'...")
+    separator = _get_cached_model(model, device)
+
+    wav = _take_handed_off_stem(input_file, separator.samplerate)
+    if wav is None:
+        wav = AudioFile(input_file).read(streams=0, samplerate=separator.samplerate, channels=separator.audio_channels)
+    ref = wav.mean(0)
+    wav = (wav - ref.mean()) / ref.std()
+
+    def separate():
+        with torch.no_grad(), _autocast(device), (_torch_threads(threads) if threads else contextlib.nullcontext()):
+            num_workers = (jobs or _cpu_jobs()) if device == "cpu" else 0  # same as the CLI's --jobs
+            sources = apply_model(separator, wav[None], device=device, shifts=1, split=True, overlap=0.25, progress=False, num_workers=num_workers)[0]
+        return sources.float()
+
+    run = _InProcessRun()
+    if job_id:
+        ACTIVE_PROCESSES[job_id] = run
+    # apply_model has no progress hook, so keep the stream alive with a heartbeat
+    # and check for cancellation between beats
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        future = executor.submit(separate)
+        elapsed = 0
+        while not wait([future], timeout=5).done:
+            if run.cancelled.is_set():
+                break
+            elapsed += 5
+            if progress_callback:
+                yield progress_callback(f"Separating '{Path(input_file).name}' with {model}... ({elapsed}s)")
+        if run.cancelled.is_set():
+            print(f" Cancelled in-process separation of '{Path(input_file).name}'. Waiting for the model call to finish...")
+            # Same as a killed CLI run, so the caller stops instead of building on missing stems
+            raise subprocess.CalledProcessError(-9, ["demucs", input_file])
+        sources = future.result() * ref.std() + ref.mean()
+    finally:
+        # The model call can't be interrupted. However this generator ends (cancel, a
+        # closed stream, an error), wait it out, so the caller's device slot isn't
+        # handed to the next job while this one still holds the GPU
+        executor.shutdown(wait=True)
+        if job_id:
+            ACTIVE_PROCESSES.pop(job_id, None)
+
+    stems = dict(zip(separator.sources, sources))
+    if two_stems_target:
+        target = stems.pop(two_stems_target)
+        stems = {two_stems_target: target, f"no_{two_stems_target}": sum(stems.values())}
+
+    track_dir = os.path.join(output_dir, model, _track_name(input_file))
+    os.makedirs(track_dir, exist_ok=True)
+    for name, source in stems.items():
+        # Same 16-bit, rescale-on-clip output as the CLI defaults
+        source = prevent_clip(source.cpu(), mode="rescale")
+        stem_path = os.path.join(track_dir, f"{name}.wav")
+        save_audio(source, stem_path, samplerate=separator.samplerate, clip="none", bits_per_sample=16, as_float=False)
+        if name in keep_stems:
+            with _STEM_HANDOFF_LOCK:
+                _STEM_HANDOFF[os.path.abspath(stem_path)] = (source, separator.samplerate)
+
+def _pipe_lines(fd, chunk_size=1 << 16):
+    """Non-empty lines from a raw pipe, split on \\r as well as \\n (tqdm redraws with \\r)."""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    pending = ''
+    while True:
+        chunk = os.read(fd, chunk_size)  # blocking read of whatever is there; works on Windows pipes too
+        if not chunk:
+            break
+        *lines, pending = _LINE_BREAK.split(pending + decoder.decode(chunk))
+        for line in lines:
+            line = line.strip()
+            if line:
+                yield line
+    pending = (pending + decoder.decode(b'', final=True)).strip()
+    if pending:
+        yield pending
+
+_LINE_BREAK = re.compile(r'[\r\n]')
+# Demucs redraws its tqdm bar far more often than the progress bar needs
+_PROGRESS_INTERVAL = 0.1  # seconds
+_PROGRESS_PERCENT = re.compile(r'(\d+)%\|')
+
+def _debounce_progress(lines, interval=_PROGRESS_INTERVAL):
+    """Passes lines through, but at most one tqdm progress line per interval (the newest wins),
+    and only when its percentage has moved since the last one sent."""
+    last_sent = 0.0
+    last_percent = None
+    held = None
+    for line in lines:
+        if '%|' not in line:
+            if held is not None:
+                yield held
+                held = None
+            yield line
+            continue
+        now = time.monotonic()
+        match = _PROGRESS_PERCENT.search(line)
+        percent = match.group(1) if match else None
+        if now - last_sent >= interval and (percent is None or percent != last_percent):
+            held = None
+            last_sent = now
+            last_percent = percent
+            yield line
+        else:
+            held = line
+    if held is not None:
+        yield held
+
+def _cpu_jobs():
+    # Demucs worker processes for a CPU run; half the cores leaves room for the enhancement pool
+    return max(1, (os.cpu_count() or 1) // 2)
+
+def _run_demucs(venv_python, input_file, output_dir, model, device, two_stems_target=None, job_id: Optional[str] = None, progress_callback: Optional[Callable[[str], None]] = None, keep_stems=(), threads: Optional[int] = None, jobs: Optional[int] = None, gpu: Optional[int] = None):
+    if DEMUCS_IN_PROCESS and _demucs_importable():
+        if gpu is not None:
+            device = f"{device}:{gpu}"
+        yield from _run_demucs_in_process(input_file, output_dir, model, device, two_stems_target, job_id, progress_callback, keep_stems, threads, jobs)
+        return
 
-def _run_demucs(venv_python, input_file, output_dir, model, device, two_stems_target=None, job_id: Optional[str] = None, progress_callback: Optional[Callable[[str], None]] = None):
     command = [
         venv_python, "-m", "demucs",
         "-n", model, "-d", device, "-o", output_dir,
     ]
     if two_stems_target:
         command.extend(["--two-stems", two_stems_target])
+    if device == "cpu":
+        command.extend(["--jobs", str(jobs or _cpu_jobs())])
     
     command.append(input_file)
 
+    env = None
+    if threads:
+        # Runs sharing the CPU each get their slice of cores instead of all oversubscribing them
+        env = dict(os.environ, OMP_NUM_THREADS=str(threads), MKL_NUM_THREADS=str(threads))
+    if gpu is not None:
+        # Pin the run to one card; Demucs then sees it as plain "cuda"
+        env = dict(env or os.environ, CUDA_VISIBLE_DEVICES=str(gpu))
+
     print(f" Running Demucs on '{Path(input_file).name}'...")
+    yield from _run_command(command, job_id, progress_callback, env)
+
+def _run_command(command, job_id: Optional[str] = None, progress_callback: Optional[Callable[[str], None]] = None, env=None):
+    """Runs a Demucs command, streaming its output as progress. Raises CalledProcessError unless it succeeds (returncode -9 if it was killed)."""
     proc = None
     try:
-        proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding='utf-8')
+        # One merged pipe: a separate stdout PIPE nobody reads can fill up and
+        # stall Demucs, and communicate() would only block on it. Unbuffered
+        # bytes, because _pipe_lines reads the raw fd in chunks.
+        proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=0, env=env)
         
         if job_id:
             ACTIVE_PROCESSES[job_id] = proc
 
-        if proc.stderr:
-            for line in iter(proc.stderr.readline, ''):
-                line = line.strip()
-                if progress_callback:
-                    yield progress_callback(line)
-                else:
-                    print(line.strip())
-        
-        stdout, stderr = proc.communicate()
+        recent_output = deque(maxlen=20)  # only the tail is needed for error reports
+        for line in _debounce_progress(_pipe_lines(proc.stdout.fileno())):
+            recent_output.append(line)
+            if progress_callback:
+                yield progress_callback(line)
+            else:
+                print(line)
 
-        if proc.returncode != 0 and proc.returncode != -9:
-            print(f"Demucs Error: {stderr}")
-            raise subprocess.CalledProcessError(proc.returncode, command, output=stdout, stderr=stderr)
+        returncode = proc.wait()
+        if returncode != 0:
+            stderr = "\n".join(recent_output)
+            if returncode != -9:
+                print(f"Demucs Error: {stderr}")
+            # A killed run raises too, so a cancelled job doesn't go on to its next pass
+            raise subprocess.CalledProcessError(returncode, command, stderr=stderr)
     finally:
         if job_id and job_id in ACTIVE_PROCESSES:
             del ACTIVE_PROCESSES[job_id]
         if proc and proc.poll() is None:
             proc.kill()
 
-def separate_audio_ultra(input_file, output_dir="output_demucs", model="htdemucs", device="cpu", components=4, enhance=True, silence_threshold_db: int = 30, progress_callback: Optional[Callable[[str], None]] = None):
+_BATCH_RUNNER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "demucs_batch.py")
+
+def _run_demucs_batch(venv_python, jobs, model, device, job_id: Optional[str] = None, progress_callback: Optional[Callable[[str], None]] = None):
+    """Runs several (input_file, output_dir, two_stems_target) separations in one child process, loading the model once."""
+    command = [venv_python, _BATCH_RUNNER, model, device, json.dumps(jobs)]
+    print(f" Running Demucs on {len(jobs)} stems in one process...")
+    yield from _run_command(command, job_id, progress_callback)
+
+def kill_job(job_id):
+    """Kills every Demucs process started for job_id, including its pass-2 runs. Returns how many were killed."""
+    killed = 0
+    for key, proc in list(ACTIVE_PROCESSES.items()):
+        if (key == job_id or key.startswith(f"{job_id}:")) and proc.poll() is None:
+            proc.kill()
+            killed += 1
+    return killed
+
+# Rough peak VRAM of one htdemucs_ft run; override with DEMUCS_GPU_MEM_GB
+_DEMUCS_GPU_MEM_BYTES = float(os.environ.get("DEMUCS_GPU_MEM_GB", "3")) * 1024 ** 3
+
+def _cuda_device_count():
+    try:
+        import torch
+        return torch.cuda.device_count()
+    except Exception:
+        return 0
+
+def _pass2_workers(device, runs):
+    """How many pass-2 Demucs runs can share the device at once."""
+    if runs <= 1:
+        return 1
+    if device == "cpu":
+        # Each Demucs process already uses several torch threads
+        return max(1, min(runs, (os.cpu_count() or 1) // 2))
+    try:
+        import torch
+        free, total = torch.cuda.mem_get_info()
+    except Exception:
+        return 1  # can't tell how much room there is, stay serial
+    if _DEMUCS_GPU_MEM_BYTES > 0.4 * total:
+        return 1
+    return max(1, min(runs, int(free // _DEMUCS_GPU_MEM_BYTES)))
+
+def _run_demucs_parallel(runs, max_workers):
+    """Drives several _run_demucs generators at once, yielding their progress as it arrives."""
+    if max_workers <= 1:
+        for run in runs:
+            yield from run
+        return
+
+    lines = queue.Queue()
+    finished = object()
+    cancelled = threading.Event()
+
+    def drain(run):
+        try:
+            if cancelled.is_set():
+                return
+            for item in run:
+                if cancelled.is_set():
+                    break
+                lines.put(item)
+        finally:
+            run.close()  # kills the Demucs process if it is still running
+            lines.put(finished)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(drain, run) for run in runs]
+        try:
+            remaining = len(futures)
+            while remaining:
+                item = lines.get()
+                if item is finished:
+                    remaining -= 1
+                else:
+                    yield item
+        except BaseException:
+            cancelled.set()
+            raise
+        for future in futures:
+            future.result()  # re-raise the first CalledProcessError
+
+def separate_audio_ultra(input_file, output_dir="output_demucs", model="htdemucs", device="cpu", components=4, enhance=True, silence_threshold_db: int = 30, parallel_passes: bool = True, overlap: bool = False, progress_callback: Optional[Callable[[str], None]] = None, job_id: Optional[str] = None):
+    """
+    Yields progress lines; returns True only if the separation ran to the end
+    without an error or a cancellation.
+    """
     print(f" Starting ULTRA {components}-component separation for: {input_file}")
     
     os.makedirs(output_dir, exist_ok=True)
@@ -213,20 +937,21 @@ def separate_audio_ultra(input_file, output_dir="output_demucs", model="htdemucs
     try:
         if not os.path.exists(input_file):
             if progress_callback: yield progress_callback(f"ERROR: Input file '{input_file}' not found")
-            return
+            return False
             
-        job_id = Path(input_file).name
+        job_id = job_id or os.path.basename(input_file)
         
         if components == 4:
             yield from _separate_4_components(venv_python, input_file, output_dir, model, device, enhance, silence_threshold_db, job_id, progress_callback=progress_callback)
         elif components == 6:
             yield from _separate_6_components(venv_python, input_file, output_dir, model, device, enhance, silence_threshold_db, job_id, progress_callback=progress_callback)
         elif components == 8:
-            yield from _separate_8_components(venv_python, input_file, output_dir, device, enhance, silence_threshold_db, job_id, progress_callback=progress_callback)
+            yield from _separate_8_components(venv_python, input_file, output_dir, device, enhance, silence_threshold_db, job_id, parallel_passes, overlap, progress_callback=progress_callback)
         
         print(" Ultra separation complete!")
         used_model = "htdemucs_ft" if components == 8 else model
         print_ultra_components_info(input_file, output_dir, components, used_model)
+        return True
         
     except FileNotFoundError as e:
         if progress_callback: yield progress_callback(f"ERROR: {e}")
@@ -236,6 +961,7 @@ def separate_audio_ultra(input_file, output_dir="output_demucs", model="htdemucs
             if progress_callback: yield progress_callback(f"ERROR: {error_message}")
     except Exception as e:
         if progress_callback: yield progress_callback(f"ERROR: An unexpected error occurred: {e}")
+    return False
 
 def _separate_4_components(venv_python, input_file, output_dir, model, device, enhance, silence_threshold_db, job_id: str, progress_callback: Optional[Callable[[str], None]] = None):
     yield from _run_demucs(venv_python, input_file, output_dir, model, device, job_id=job_id, progress_callback=progress_callback)
@@ -246,16 +972,19 @@ def _separate_4_components(venv_python, input_file, output_dir, model, device, e
 def _separate_6_components(venv_python, input_file, output_dir, model, device, enhance, silence_threshold_db, job_id: str, progress_callback: Optional[Callable[[str], None]] = None):
     if progress_callback: yield progress_callback("Running 6-component separation (Pass 1/2)...")
     
-    yield from _run_demucs(venv_python, input_file, output_dir, model, device, job_id=job_id, progress_callback=progress_callback)
+    yield from _run_demucs(venv_python, input_file, output_dir, model, device, job_id=job_id, progress_callback=progress_callback, keep_stems=("other",))
 
-    base_name = Path(input_file).stem
+    base_name = _track_name(input_file)
     track_dir = os.path.join(output_dir, model, base_name)
     other_file = os.path.join(track_dir, "other.wav")
     
     if os.path.exists(other_file):
         if progress_callback: yield progress_callback("Further separating 'other' component (Pass 2/2)...")
         advanced_output_dir = os.path.join(output_dir, "advanced")
-        yield from _run_demucs(venv_python, other_file, advanced_output_dir, model, device, "other", job_id=f"{job_id}-other", progress_callback=progress_callback)
+        try:
+            yield from _run_demucs(venv_python, other_file, advanced_output_dir, model, device, "other", job_id=f"{job_id}:other", progress_callback=progress_callback)
+        finally:
+            _discard_handed_off_stems(track_dir)
         
         create_6_component_structure(track_dir, output_dir, base_name, model)
         
@@ -263,107 +992,210 @@ def _separate_6_components(venv_python, input_file, output_dir, model, device, e
             if progress_callback: yield progress_callback("Enhancing audio quality...")
             enhance_6_components(input_file, output_dir, silence_threshold_db)
 
-def _separate_8_components(venv_python, input_file, output_dir, device, enhance, silence_threshold_db, job_id: str, progress_callback: Optional[Callable[[str], None]] = None):
+def _separate_8_components(venv_python, input_file, output_dir, device, enhance, silence_threshold_db, job_id: str, parallel_passes: bool = True, overlap: bool = False, progress_callback: Optional[Callable[[str], None]] = None):
     best_model = "htdemucs_ft"
     print(f" Overriding model to '{best_model}' for highest quality 8-component separation.")
     
     print(" Pass 1/2: Standard 4-component separation...")
-    yield from _run_demucs(venv_python, input_file, output_dir, best_model, device, job_id=job_id, progress_callback=progress_callback)
+    stems_to_separate = {
+        "vocals": "advanced_vocals", "drums": "advanced_drums", "other": "advanced_other"
+    }
+    yield from _run_demucs(venv_python, input_file, output_dir, best_model, device, job_id=job_id, progress_callback=progress_callback, keep_stems=tuple(stems_to_separate))
     
-    base_name = Path(input_file).stem
+    base_name = _track_name(input_file)
     track_dir = os.path.join(output_dir, best_model, base_name)
     
     if not os.path.exists(track_dir):
         print(f" Warning: Initial separation directory not found at '{track_dir}'. Skipping advanced separation.")
         return
 
-    if progress_callback: yield progress_callback("Pass 2/2: Advanced component separation...")
-    stems_to_separate = {
-        "vocals": "advanced_vocals", "drums": "advanced_drums", "other": "advanced_other"
-    }
-    for stem, adv_dir in stems_to_separate.items():
-        stem_file = os.path.join(track_dir, f"{stem}.wav")
-        if os.path.exists(stem_file):
-            yield from _run_demucs(venv_python, stem_file, os.path.join(output_dir, adv_dir), best_model, device, stem, job_id=f"{job_id}-{stem}", progress_callback=progress_callback)
+    early_tasks, early_enhance = [], None
+    if enhance and overlap:
+        # Pass 2 only reads the pass-1 stems, so enhance them into the final folder meanwhile
+        final_dir = os.path.join(output_dir, "8_components", base_name)
+        os.makedirs(final_dir, exist_ok=True)
+        early_tasks = _enhance_tasks(track_dir, final_dir, _PASS1_STEMS, silence_threshold_db)
+        early_enhance = _submit_enhance(early_tasks)
 
-    create_8_component_structure_direct(track_dir, output_dir, base_name, best_model)
-    if enhance:
-        if progress_callback: yield progress_callback("Enhancing audio quality...")
-        enhance_8_components(input_file, output_dir, silence_threshold_db)
+    try:
+        if progress_callback: yield progress_callback("Pass 2/2: Advanced component separation...")
+        jobs = []
+        for stem, adv_dir in stems_to_separate.items():
+            stem_file = os.path.join(track_dir, f"{stem}.wav")
+            if os.path.exists(stem_file):
+                jobs.append((stem_file, os.path.join(output_dir, adv_dir), stem))
+        max_workers = _pass2_workers(device, len(jobs)) if parallel_passes else 1
+        # With several GPUs, deal the runs out round-robin, one card each
+        gpus = _cuda_device_count() if device == "cuda" and parallel_passes else 0
+        if gpus > 1:
+            max_workers = max(max_workers, min(len(jobs), gpus))
+        try:
+            if max_workers == 1 and len(jobs) > 1 and not DEMUCS_IN_PROCESS and _demucs_importable():
+                # Serial anyway: one child that loads the model once beats one `python -m demucs` per stem
+                yield from _run_demucs_batch(venv_python, jobs, best_model, device, job_id=f"{job_id}:pass2", progress_callback=progress_callback)
+            else:
+                threads = max(1, (os.cpu_count() or 1) // max_workers) if device == "cpu" and max_workers > 1 else None
+                runs = []
+                for i, (stem_file, adv_output_dir, stem) in enumerate(jobs):
+                    # Tag progress with the stem, since the runs interleave
+                    stem_callback = (lambda line, stem=stem: progress_callback(f"[{stem}] {line}")) if progress_callback else None
+                    runs.append(_run_demucs(venv_python, stem_file, adv_output_dir, best_model, device, stem, job_id=f"{job_id}:{stem}", progress_callback=stem_callback,
+                                            threads=threads, jobs=1 if threads else None, gpu=i % gpus if gpus > 1 else None))
+                yield from _run_demucs_parallel(runs, max_workers)
+        finally:
+            _discard_handed_off_stems(track_dir)
 
-def enhance_4_components(input_file, output_dir, model="htdemucs", silence_threshold_db: int = 30):
-    base_name = Path(input_file).stem
-    track_dir = os.path.join(output_dir, model, base_name)
-    
-    enhancement_map = _get_enhancement_map()
-    if not os.path.exists(track_dir):
-        return
+        create_8_component_structure_direct(track_dir, output_dir, base_name, best_model)
+        if enhance:
+            if progress_callback: yield progress_callback("Enhancing audio quality...")
+            if early_enhance:
+                final_dir = os.path.join(output_dir, "8_components", base_name)
+                _swap_in_enhanced(final_dir, early_tasks, _enhance_results(early_tasks, early_enhance))
+                _enhance_stems(final_dir, _PASS2_STEMS, silence_threshold_db)
+            else:
+                enhance_8_components(input_file, output_dir, silence_threshold_db)
+    finally:
+        if early_enhance:
+            # Pass 2 or enhancement failed partway: don't leave early temp outputs in the results folder
+            _discard_temp_enhanced(early_tasks, early_enhance)
 
-    for stem_name in ["vocals", "drums", "bass", "other"]:
+def _enhance_one(task):
+    # Module-level so ProcessPoolExecutor can pickle it
+    input_path, enhanced_path, enhancement_type, silence_threshold_db = task
+    return enhance_audio(input_path, enhanced_path, enhancement_type, silence_threshold_db)
+
+def _enhance_fingerprint(path, enhancement_type, silence_threshold_db):
+    # A stem rewritten by Demucs or relinked gets a new mtime, so the mark no longer matches
+    st = os.stat(path)
+    key = f"{st.st_mtime_ns}:{st.st_size}:{enhancement_type}:{silence_threshold_db}"
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+def _already_enhanced(path, enhancement_type, silence_threshold_db):
+    """True if path is exactly what a previous enhancement pass with these settings left behind."""
+    try:
+        with open(path + ".enh") as f:
+            return f.read() == _enhance_fingerprint(path, enhancement_type, silence_threshold_db)
+    except OSError:
+        return False
+
+def _mark_enhanced(path, enhancement_type, silence_threshold_db):
+    with open(path + ".enh", "w") as f:
+        f.write(_enhance_fingerprint(path, enhancement_type, silence_threshold_db))
+
+def _enhance_tasks(source_dir, track_dir, stem_names, silence_threshold_db):
+    """One _enhance_one task per stem present in source_dir, writing a temp file into track_dir."""
+    present = _scan_track_dir(source_dir)
+    tasks = []
+    for stem_name in stem_names:
         filename = f"{stem_name}.wav"
-        input_path = os.path.join(track_dir, filename)
-        if os.path.exists(input_path):
+        if filename in present:
+            input_path = os.path.join(source_dir, filename)
+            enhancement_type = _ENHANCEMENT_MAP.get(stem_name, "other")
+            if source_dir == track_dir and _already_enhanced(input_path, enhancement_type, silence_threshold_db):
+                print(f"   {filename} is already enhanced, skipping.")
+                continue
             temp_enhanced_path = os.path.join(track_dir, f"temp_enhanced_{filename}")
-            enhancement_type = enhancement_map.get(stem_name, "other")
-            if enhance_audio(input_path, temp_enhanced_path, enhancement_type, silence_threshold_db):
-                print(f"   Enhanced {filename}")
-                os.remove(input_path)
-                os.rename(temp_enhanced_path, input_path)
-            else:
-                print(f"   Skipped empty {filename} (after trimming), original file kept.")
-                if os.path.exists(temp_enhanced_path):
-                    os.remove(temp_enhanced_path)
+            tasks.append((input_path, temp_enhanced_path, enhancement_type, silence_threshold_db))
+    return tasks
 
-def enhance_6_components(input_file, output_dir, silence_threshold_db: int = 30):
-    base_name = Path(input_file).stem
-    track_dir = os.path.join(output_dir, "6_components", base_name)
-    
-    enhancement_map = _get_enhancement_map()
-    if not os.path.exists(track_dir):
+def _swap_in_enhanced(track_dir, tasks, results):
+    for (input_path, temp_enhanced_path, enhancement_type, silence_threshold_db), enhanced in zip(tasks, results):
+        filename = os.path.basename(input_path)
+        target_path = os.path.join(track_dir, filename)
+        if enhanced:
+            print(f"   Enhanced {filename}")
+            # Atomic swap: the stem is never missing, and a linked original elsewhere is left alone
+            os.replace(temp_enhanced_path, target_path)
+        else:
+            print(f"   Skipped empty {filename} (after trimming), original file kept.")
+            try:
+                os.remove(temp_enhanced_path)
+            except FileNotFoundError:
+                pass
+        # Either way this file has had its enhancement pass; don't redo it on a re-run
+        _mark_enhanced(target_path, enhancement_type, silence_threshold_db)
+
+def _discard_temp_enhanced(tasks, submitted=None):
+    """Removes whatever temp outputs of 'tasks' were not swapped in, once any still running (see _submit_enhance) are done."""
+    if submitted and submitted[1]:
+        wait(submitted[1])
+    for _, temp_enhanced_path, _, _ in tasks:
+        try:
+            os.remove(temp_enhanced_path)
+        except FileNotFoundError:
+            pass
+
+def _enhance_stems(track_dir, stem_names, silence_threshold_db):
+    """Enhances the given stems of one track in parallel, then swaps each result in over its original."""
+    tasks = _enhance_tasks(track_dir, track_dir, stem_names, silence_threshold_db)
+    if not tasks:
         return
+    try:
+        _swap_in_enhanced(track_dir, tasks, _enhance_results(tasks))
+    finally:
+        _discard_temp_enhanced(tasks)
 
-    for stem_name in ["vocals", "drums", "bass", "piano", "guitar", "other"]:
-        filename = f"{stem_name}.wav"
-        input_path = os.path.join(track_dir, filename)
-        if os.path.exists(input_path):
-            temp_enhanced_path = os.path.join(track_dir, f"temp_enhanced_{filename}")
-            enhancement_type = enhancement_map.get(stem_name, "other")
-            if enhance_audio(input_path, temp_enhanced_path, enhancement_type, silence_threshold_db):
-                print(f"   Enhanced {filename}")
-                os.remove(input_path)
-                os.rename(temp_enhanced_path, input_path)
-            else:
-                print(f"   Skipped empty {filename} (after trimming), original file kept.")
-                if os.path.exists(temp_enhanced_path):
-                    os.remove(temp_enhanced_path)
+def enhance_4_components(input_file, output_dir, model="htdemucs", silence_threshold_db: int = 30):
+    track_dir = os.path.join(output_dir, model, _track_name(input_file))
+    _enhance_stems(track_dir, ["vocals", "drums", "bass", "other"], silence_threshold_db)
+
+def enhance_6_components(input_file, output_dir, silence_threshold_db: int = 30):
+    track_dir = os.path.join(output_dir, "6_components", _track_name(input_file))
+    _enhance_stems(track_dir, ["vocals", "drums", "bass", "piano", "guitar", "other"], silence_threshold_db)
+
+_PASS1_STEMS = ["vocals", "drums", "bass", "other"]
+_PASS2_STEMS = ["lead_vocals", "harmony", "kick_snare", "cymbals", "piano", "guitar"]
 
 def enhance_8_components(input_file, output_dir, silence_threshold_db: int = 30):
-    base_name = Path(input_file).stem
-    track_dir = os.path.join(output_dir, "8_components", base_name)
-    
-    enhancement_map = _get_enhancement_map()
-    if not os.path.exists(track_dir):
-        return
+    track_dir = os.path.join(output_dir, "8_components", _track_name(input_file))
+    _enhance_stems(track_dir, _PASS1_STEMS + _PASS2_STEMS, silence_threshold_db)
 
-    stems_to_enhance = [
-        "vocals", "drums", "bass", "other",
-        "lead_vocals", "harmony", "kick_snare", "cymbals", "piano", "guitar"
-    ]
+def _place(src, dst, move=False):
+    """Puts src at dst without copying the WAV bytes where possible. Returns False if src doesn't exist.
 
-    for stem_name in stems_to_enhance:
-        filename = f"{stem_name}.wav"
-        input_path = os.path.join(track_dir, filename)
-        if os.path.exists(input_path):
-            temp_enhanced_path = os.path.join(track_dir, f"temp_enhanced_{filename}")
-            enhancement_type = enhancement_map.get(stem_name, "other")
-            if enhance_audio(input_path, temp_enhanced_path, enhancement_type, silence_threshold_db):
-                print(f"   Enhanced {filename}")
-                os.remove(input_path)
-                os.rename(temp_enhanced_path, input_path)
-            else:
-                print(f"   Skipped empty {filename} (after trimming), original file kept.")
-                if os.path.exists(temp_enhanced_path):
-                    os.remove(temp_enhanced_path)
+    move=True is for pass-2 intermediates nothing reads again: a rename.
+    Otherwise dst is a hardlink, for stems that must also stay where they are
+    (the pass-1 folder doubles as the 4-component result), or a reflink/copy
+    across devices. Enhancement swaps files in by rename, so linked copies
+    never diverge.
+    """
+    if move:
+        try:
+            os.replace(src, dst)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError:
+            pass  # e.g. cross-device; link or copy instead
+    try:
+        os.remove(dst)  # left over from an earlier run, possibly a link to src
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(src, dst)
+    except FileNotFoundError:
+        return False
+    except OSError:  # cross-device or unsupported filesystem
+        if not _reflink(src, dst):
+            shutil.copyfile(src, dst)
+    return True
+
+_FICLONE = 0x40049409  # Linux ioctl: share src's extents copy-on-write (btrfs, XFS, ...)
+
+def _reflink(src, dst):
+    """Clones src to dst without copying data where the filesystem supports it. Returns False otherwise."""
+    if fcntl is None:
+        return False
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        return True
+    except OSError:
+        try:
+            os.remove(dst)
+        except FileNotFoundError:
+            pass
+        return False
 
 def create_6_component_structure(track_dir, output_dir, base_name, model="htdemucs"):
     advanced_dir = os.path.join(output_dir, "advanced", model, "other")
@@ -372,27 +1204,15 @@ def create_6_component_structure(track_dir, output_dir, base_name, model="htdemu
     
     components = ["vocals.wav", "drums.wav", "bass.wav", "other.wav"]
     for comp in components:
-        src = os.path.join(track_dir, comp)
-        dst = os.path.join(final_dir, comp)
-        if os.path.exists(src):
-            shutil.copy(src, dst)
+        _place(os.path.join(track_dir, comp), os.path.join(final_dir, comp))
     
-    if os.path.exists(advanced_dir):
-        other_src = os.path.join(advanced_dir, "other.wav")
-        other_dst = os.path.join(final_dir, "piano.wav")
-        if os.path.exists(other_src):
-            shutil.copy(other_src, other_dst)
-            print(f" Created piano.wav")
-        
-        no_other_src = os.path.join(advanced_dir, "no_other.wav")
-        no_other_dst = os.path.join(final_dir, "guitar.wav")
-        if os.path.exists(no_other_src):
-            shutil.copy(no_other_src, no_other_dst)
-            print(f" Created guitar.wav")
-
-def _copy_and_log(src_path, dst_path):
-    if os.path.exists(src_path):
-        shutil.copy(src_path, dst_path)
+    if _place(os.path.join(advanced_dir, "other.wav"), os.path.join(final_dir, "piano.wav"), move=True):
+        print(f" Created piano.wav")
+    if _place(os.path.join(advanced_dir, "no_other.wav"), os.path.join(final_dir, "guitar.wav"), move=True):
+        print(f" Created guitar.wav")
+
+def _copy_and_log(src_path, dst_path, move=False):
+    if _place(src_path, dst_path, move):
         print(f" Created {Path(dst_path).name}")
 
 def create_8_component_structure_direct(track_dir, output_dir, base_name, model_for_advanced_stems):
@@ -415,34 +1235,61 @@ def create_8_component_structure_direct(track_dir, output_dir, base_name, model_
     for src_dir, src_filename, dst_filename in file_map:
         src_path = os.path.join(src_dir, src_filename)
         dst_path = os.path.join(final_dir, dst_filename)
-        _copy_and_log(src_path, dst_path)
+        # Pass-1 stems stay put (they are also the 4-component result); pass-2 ones just move
+        _copy_and_log(src_path, dst_path, move=src_dir != track_dir)
 
-def get_separation_results(input_file, output_dir, components, model):
-    # ... (This function is unchanged) ...
-    base_name = Path(input_file).stem
-    results = []
-    
+def _results_relative_dir(input_file, components, model):
+    base_name = _track_name(input_file)
     if components == 4:
-        relative_dir = os.path.join(model, base_name)
-        track_dir = os.path.join(output_dir, relative_dir)
-        files_to_check = ["vocals.wav", "drums.wav", "bass.wav", "other.wav"]
+        return os.path.join(model, base_name)
     elif components == 6:
-        relative_dir = os.path.join("6_components", base_name)
-        track_dir = os.path.join(output_dir, relative_dir)
-        files_to_check = ["vocals.wav", "drums.wav", "bass.wav", "piano.wav", "guitar.wav", "other.wav"]
+        return os.path.join("6_components", base_name)
     elif components == 8:
-        relative_dir = os.path.join("8_components", base_name)
-        track_dir = os.path.join(output_dir, relative_dir)
-        files_to_check = [
-            "vocals.wav", "drums.wav", "bass.wav", "other.wav",
-            "lead_vocals.wav", "harmony.wav", "kick_snare.wav", "cymbals.wav", 
-            "piano.wav", "guitar.wav"
-        ]
-    else:
+        return os.path.join("8_components", base_name)
+    return None
+
+def get_results_dir(input_file, output_dir, components, model):
+    """Returns the directory holding the final stems for a job, or None for an unknown component count."""
+    relative_dir = _results_relative_dir(input_file, components, model)
+    return os.path.join(output_dir, relative_dir) if relative_dir else None
+
+def _scan_track_dir(track_dir):
+    """Maps file name -> os.DirEntry for one stem folder; empty if the folder doesn't exist."""
+    try:
+        with os.scandir(track_dir) as it:
+            return {entry.name: entry for entry in it if entry.is_file()}
+    except FileNotFoundError:
+        return {}
+
+def _result_stems(components):
+    if components == 4:
+        return ["vocals.wav", "drums.wav", "bass.wav", "other.wav"]
+    elif components == 6:
+        return ["vocals.wav", "drums.wav", "bass.wav", "piano.wav", "guitar.wav", "other.wav"]
+    return [
+        "vocals.wav", "drums.wav", "bass.wav", "other.wav",
+        "lead_vocals.wav", "harmony.wav", "kick_snare.wav", "cymbals.wav", 
+        "piano.wav", "guitar.wav"
+    ]
+
+def separation_complete(input_file, output_dir, components, model):
+    """True if every stem the component mode produces is on disk."""
+    results = get_separation_results(input_file, output_dir, components, model)
+    return bool(results) and len(results) == len(_result_stems(components))
+
+def get_separation_results(input_file, output_dir, components, model):
+    results = []
+    
+    relative_dir = _results_relative_dir(input_file, components, model)
+    if relative_dir is None:
         return []
+    track_dir = os.path.join(output_dir, relative_dir)
 
+    files_to_check = _result_stems(components)
+
+    present = _scan_track_dir(track_dir)  # one directory read instead of a stat per stem
     for filename in files_to_check:
-        if os.path.exists(os.path.join(track_dir, filename)):
+        if filename in present:
             results.append({
                 "name": filename.replace('_', ' ').replace('.wav', '').title(),
                 "path": os.path.join(relative_dir, filename).replace('\\', '/')
@@ -451,20 +1298,18 @@ def get_separation_results(input_file, output_dir, components, model):
     return results
 
 
-def _print_component_info(track_dir, emoji, description, filename):
-    # ... (This function is unchanged) ...
-    file_path = os.path.join(track_dir, filename)
-    
+def _print_component_info(entries, emoji, description, filename):
     print(f"{emoji} - {description}")
-    if os.path.exists(file_path):
-        file_size = os.path.getsize(file_path) / (1024 * 1024)
+    entry = entries.get(filename)
+    if entry is not None:
+        file_size = entry.stat().st_size / (1024 * 1024)
         print(f"     {filename} ({file_size:.1f} MB)")
     else:
         print(f"     {filename} (File not found)")
 
 def print_ultra_components_info(input_file, output_dir, components, model):
     # ... (This function is unchanged) ...
-    base_name = Path(input_file).stem
+    base_name = _track_name(input_file)
     
     print("\n" + "=" * 70)
     print(f" ULTRA {components}-COMPONENT SEPARATION RESULTS:")
@@ -507,8 +1352,9 @@ def print_ultra_components_info(input_file, output_dir, components, model):
         ]
     
     if track_dir:
+        entries = _scan_track_dir(track_dir)
         for emoji, description, filename in components_info:
-            _print_component_info(track_dir, emoji, description, filename)
+            _print_component_info(entries, emoji, description, filename)
         print(f"\n All files saved in: {track_dir}")
     else:
         print("   Error: Invalid component number.")
@@ -518,8 +1364,18 @@ def print_ultra_components_info(input_file, output_dir, components, model):
 def main():
     parser = argparse.ArgumentParser(description="Ultra-Enhanced Music Source Separation with Audio Enhancement")
     main.parser = parser
-    # ... (rest of main function is unchanged) ...
+    parser.add_argument("input", help="Input audio file path")
+    parser.add_argument("-o", "--output", default="output_demucs", help="Output directory for separated files")
+    parser.add_argument("-m", "--model", default="htdemucs", help="Demucs model to use (htdemucs, htdemucs_ft, mdx_extra)")
+    parser.add_argument("-d", "--device", default="cpu", help="Device to use (cpu, cuda)")
+    parser.add_argument("-c", "--components", type=int, default=4, choices=[4, 6, 8], help="Number of stems to separate")
+    parser.add_argument("--no-enhance", action="store_true", help="Disable the audio enhancement post-processing step")
+    parser.add_argument("--silence-threshold", type=int, default=30, help="dB threshold for silence trimming")
+    parser.add_argument("--no-parallel-passes", action="store_true", help="Run the 8-component pass-2 separations one at a time (small GPUs)")
+    parser.add_argument("--overlap", action="store_true", help="In 8-component mode, enhance the pass-1 stems while pass 2 runs")
     args = parser.parse_args()
+    if MD_PRECOMPILE and not args.no_enhance:
+        start_enhancement_pool()  # compiles the kernels while Demucs runs
     for _ in separate_audio_ultra(
         args.input, 
         args.output, 
@@ -528,6 +1384,8 @@ def main():
         args.components,
         enhance=not args.no_enhance,
         silence_threshold_db=args.silence_threshold,
+        parallel_passes=not args.no_parallel_passes,
+        overlap=args.overlap,
         progress_callback=print
     ):
         pass
@@ -238,13 +238,16 @@ class MusicProcessorApp {
             
             const reader = response.body.getReader();
             const decoder = new TextDecoder();
+            // A read can end mid-frame, so the unfinished tail waits for the next chunk
+            let buffered = '';
 
             while (true) {
                 const { value, done } = await reader.read();
                 if (done) break;
 
-                const chunk = decoder.decode(value, { stream: true });
-                const lines = chunk.split('\n\n');
+                buffered += decoder.decode(value, { stream: true });
+                const lines = buffered.split('\n\n');
+                buffered = lines.pop();
 
                 for (const line of lines) {
                     if (line.startsWith('data:')) {